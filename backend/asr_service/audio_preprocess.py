@@ -0,0 +1,269 @@
+# backend/asr_service/audio_preprocess.py
+#
+# Audio preprocessing before the ASR upload. Browsers and phones hand us
+# 44.1/48 kHz stereo recordings (sometimes WebM/Ogg labelled as .wav), while the
+# ASR models only need 16 kHz mono 16-bit PCM. Converting first, and trimming the
+# leading/trailing silence, cuts upload bytes and upstream processing time.
+#
+# Everything runs as a stream of small PCM chunks, so memory use does not grow
+# with the recording length:
+#   source (wave + audioop, or ffmpeg for compressed formats)
+#     -> 16-bit mono PCM at ASR_TARGET_SAMPLE_RATE
+#     -> silence trimmer
+#     -> temporary WAV file that gets uploaded instead of the original.
+
+from array import array
+import math
+import os
+import shutil
+import subprocess
+import tempfile
+import wave
+
+from common.event_log import EventLog
+
+try:
+    import audioop
+except ImportError:  # Removed from the standard library in Python 3.13.
+    audioop = None
+
+TARGET_SAMPLE_RATE = int(os.getenv("ASR_TARGET_SAMPLE_RATE", "16000"))
+SILENCE_RMS_THRESHOLD = int(os.getenv("ASR_SILENCE_RMS_THRESHOLD", "300"))
+SILENCE_PADDING_MS = int(os.getenv("ASR_SILENCE_PADDING_MS", "200"))
+PREPROCESS_ENABLED = os.getenv("ASR_PREPROCESS_ENABLED", "true").lower() == "true"
+
+log = EventLog("asr")
+
+FRAME_MS = 20
+READ_FRAMES = 4096
+# Anti-aliasing filter applied before audioop.ratecv, which does no filtering of its own.
+LOWPASS_TAPS = 63
+LOWPASS_CUTOFF = 0.45  # Fraction of the target rate (just below its Nyquist frequency).
+
+# (magic bytes, offset, format name, MIME type)
+AUDIO_SIGNATURES = [
+    (b"RIFF", 0, "wav", "audio/wav"),
+    (b"OggS", 0, "ogg", "audio/ogg"),
+    (b"\x1a\x45\xdf\xa3", 0, "webm", "audio/webm"),
+    (b"fLaC", 0, "flac", "audio/flac"),
+    (b"ID3", 0, "mp3", "audio/mpeg"),
+    (b"ftyp", 4, "mp4", "audio/mp4"),
+]
+
+
+def detect_audio_format(file_path: str) -> tuple[str, str]:
+    """Sniffs the container format from the file header. Returns (format, mime_type)."""
+    with open(file_path, "rb") as f:
+        header = f.read(16)
+
+    for magic, offset, fmt, mime in AUDIO_SIGNATURES:
+        if header[offset:offset + len(magic)] == magic:
+            if fmt == "wav" and header[8:12] != b"WAVE":
+                continue
+            return fmt, mime
+    # Raw MPEG audio frames start with an 11-bit sync word.
+    if len(header) >= 2 and header[0] == 0xFF and header[1] & 0xE0 == 0xE0:
+        return "mp3", "audio/mpeg"
+    return "unknown", "application/octet-stream"
+
+
+# --- PCM sources (each yields 16-bit mono chunks at TARGET_SAMPLE_RATE) ---
+
+def _lowpass_taps(rate: int) -> list[float]:
+    """Windowed-sinc (Hamming) low-pass FIR with its cutoff just below the target Nyquist frequency."""
+    fc = LOWPASS_CUTOFF * TARGET_SAMPLE_RATE / rate
+    m = LOWPASS_TAPS - 1
+    taps = []
+    for i in range(LOWPASS_TAPS):
+        x = i - m / 2
+        sinc = 2 * fc if x == 0 else math.sin(2 * math.pi * fc * x) / (math.pi * x)
+        taps.append(sinc * (0.54 - 0.46 * math.cos(2 * math.pi * i / m)))
+    total = sum(taps)
+    return [t / total for t in taps]
+
+
+def _lowpass(chunk: bytes, taps: list[float], history: bytes) -> tuple[bytes, bytes]:
+    """
+    Filters one 16-bit mono chunk. The FIR runs as shifted audioop.mul/add passes
+    (all in C) on 32-bit samples, so it stays fast without numpy; `history` carries
+    the last samples over to the next chunk.
+    """
+    # Half-scale taps keep the 32-bit accumulator from saturating on overshoot.
+    wide = history + audioop.lin2lin(chunk, 2, 4)
+    overlap = (len(taps) - 1) * 4
+    length = len(wide) - overlap
+    acc = None
+    for k, h in enumerate(taps):
+        start = overlap - k * 4
+        part = audioop.mul(wide[start:start + length], 4, h / 2)
+        acc = part if acc is None else audioop.add(acc, part, 4)
+    return audioop.lin2lin(audioop.mul(acc, 4, 2.0), 4, 2), wide[-overlap:]
+
+
+def _wav_pcm_chunks(file_path: str):
+    """Streams a PCM WAV file through audioop: width -> 16-bit, downmix to mono, resample."""
+    with wave.open(file_path, "rb") as wav:
+        width = wav.getsampwidth()
+        channels = wav.getnchannels()
+        rate = wav.getframerate()
+        resample_state = None
+        if rate > TARGET_SAMPLE_RATE:
+            taps = _lowpass_taps(rate)
+            history = bytes((LOWPASS_TAPS - 1) * 4)
+
+        while chunk := wav.readframes(READ_FRAMES):
+            if width == 1:
+                # 8-bit WAV is unsigned; audioop expects signed samples.
+                chunk = audioop.bias(chunk, 1, -128)
+            if width != 2:
+                chunk = audioop.lin2lin(chunk, width, 2)
+            if channels == 2:
+                chunk = audioop.tomono(chunk, 2, 0.5, 0.5)
+            elif channels > 2:
+                # Keep the first channel of multichannel recordings.
+                samples = array("h", chunk)
+                chunk = samples[::channels].tobytes()
+            if rate > TARGET_SAMPLE_RATE:
+                # Remove content above the new Nyquist frequency, or it folds back into the speech band
+                chunk, history = _lowpass(chunk, taps, history)
+            if rate != TARGET_SAMPLE_RATE:
+                chunk, resample_state = audioop.ratecv(chunk, 2, 1, rate, TARGET_SAMPLE_RATE, resample_state)
+            yield chunk
+
+
+def _ffmpeg_pcm_chunks(file_path: str):
+    """Decodes any format ffmpeg understands to raw 16-bit mono PCM, read from a pipe."""
+    process = subprocess.Popen(
+        ["ffmpeg", "-v", "error", "-i", file_path,
+         "-f", "s16le", "-acodec", "pcm_s16le", "-ac", "1", "-ar", str(TARGET_SAMPLE_RATE), "pipe:1"],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+    try:
+        while chunk := process.stdout.read(READ_FRAMES * 2):
+            yield chunk
+    finally:
+        process.stdout.close()
+        stderr = process.stderr.read().decode(errors="replace")
+        if process.wait() != 0:
+            raise RuntimeError(f"ffmpeg could not decode audio: {stderr.strip()}")
+
+
+def _rms(frame: bytes) -> float:
+    if audioop is not None:
+        return audioop.rms(frame, 2)
+    samples = array("h", frame)
+    return (sum(s * s for s in samples) / len(samples)) ** 0.5 if samples else 0.0
+
+
+def _write_trimmed_wav(chunks, out_path: str) -> int:
+    """
+    Writes PCM chunks to a WAV file, dropping leading and trailing silence.
+    Silent frames after speech are held back until the next loud frame arrives, so
+    trailing silence is never written. Returns the number of speech frames written.
+    """
+    frame_bytes = TARGET_SAMPLE_RATE * FRAME_MS // 1000 * 2
+    padding_frames = max(SILENCE_PADDING_MS // FRAME_MS, 0)
+
+    buffer = bytearray()
+    leading = []          # Last few silent frames before speech starts (onset padding).
+    held_back = []        # Silent frames after speech, written only if speech resumes.
+    speech_frames = 0
+
+    with wave.open(out_path, "wb") as out:
+        out.setnchannels(1)
+        out.setsampwidth(2)
+        out.setframerate(TARGET_SAMPLE_RATE)
+
+        def handle(frame: bytes):
+            nonlocal speech_frames
+            loud = _rms(frame) >= SILENCE_RMS_THRESHOLD
+            if speech_frames == 0:
+                if not loud:
+                    leading.append(frame)
+                    if len(leading) > padding_frames:
+                        leading.pop(0)
+                    return
+                out.writeframes(b"".join(leading))
+                leading.clear()
+            if loud:
+                out.writeframes(b"".join(held_back) + frame)
+                held_back.clear()
+                speech_frames += 1
+            else:
+                held_back.append(frame)
+
+        for chunk in chunks:
+            buffer += chunk
+            while len(buffer) >= frame_bytes:
+                handle(bytes(buffer[:frame_bytes]))
+                del buffer[:frame_bytes]
+        if buffer:
+            handle(bytes(buffer))
+
+        # Keep a little of the trailing silence so the last word is not clipped.
+        out.writeframes(b"".join(held_back[:padding_frames]))
+
+    return speech_frames
+
+
+def preprocess_audio(file_path: str, job_id: str | None = None, trace_id: str | None = None) -> dict:
+    """
+    Converts an uploaded recording into the compact WAV the ASR model expects.
+
+    Returns {"path", "mime_type", "original_bytes", "upload_bytes", "temporary"}.
+    When preprocessing is disabled, unsupported, finds no speech, or would not
+    make the file smaller, the original file is returned with its real MIME type.
+    """
+    fmt, mime_type = detect_audio_format(file_path)
+    original_bytes = os.path.getsize(file_path)
+    passthrough = {
+        "path": file_path,
+        "mime_type": mime_type if fmt != "unknown" else "audio/wav",
+        "original_bytes": original_bytes,
+        "upload_bytes": original_bytes,
+        "temporary": False,
+    }
+
+    if not PREPROCESS_ENABLED:
+        return passthrough
+
+    has_ffmpeg = shutil.which("ffmpeg") is not None
+    if fmt == "wav" and audioop is not None:
+        source = _wav_pcm_chunks
+    elif has_ffmpeg:
+        source = _ffmpeg_pcm_chunks
+    else:
+        log.warning("preprocess.skipped", job_id, trace_id, reason=f"no decoder for {fmt} audio")
+        return passthrough
+
+    fd, out_path = tempfile.mkstemp(suffix=".wav", prefix="asr_")
+    os.close(fd)
+    try:
+        try:
+            speech_frames = _write_trimmed_wav(source(file_path), out_path)
+        except (wave.Error, EOFError) as e:
+            # Non-PCM WAV (e.g. float or compressed codecs): let ffmpeg handle it.
+            if source is _ffmpeg_pcm_chunks or not has_ffmpeg:
+                raise
+            log.emit("preprocess.ffmpeg_fallback", job_id, trace_id, format=fmt, error=str(e))
+            speech_frames = _write_trimmed_wav(_ffmpeg_pcm_chunks(file_path), out_path)
+
+        upload_bytes = os.path.getsize(out_path)
+        if speech_frames == 0 or upload_bytes >= original_bytes:
+            os.remove(out_path)
+            return passthrough
+    except Exception as e:
+        log.warning("preprocess.failed", job_id, trace_id, error=str(e))
+        if os.path.exists(out_path):
+            os.remove(out_path)
+        return passthrough
+
+    log.emit("preprocess.done", job_id, trace_id, format=fmt, original_bytes=original_bytes, upload_bytes=upload_bytes)
+    return {
+        "path": out_path,
+        "mime_type": "audio/wav",
+        "original_bytes": original_bytes,
+        "upload_bytes": upload_bytes,
+        "temporary": True,
+    }
@@ -3,10 +3,19 @@ from pydantic import BaseModel
 import uuid
 import os
 import requests
+import time
+from common.job_state import create_job_store
+from common.deadlines import http_timeout
+from common.event_log import EventLog
+from common.profiling import install_profiling
+from .audio_preprocess import preprocess_audio
 
 app = FastAPI()
+install_profiling(app)
 
-jobs = {}
+log = EventLog("asr")
+
+jobs = create_job_store("asr")
 
 class Job(BaseModel):
     jobId: str
@@ -17,27 +26,36 @@ class AsrRequest(BaseModel):
     # The user will provide the path to a local file for our script to use.
     audio_file_path: str
     language: str
+    # Absolute epoch time passed down by the orchestrator; the job gives up once it has passed
+    deadline: float | None = None
+    # The v2 job this belongs to, carried on every log record
+    trace_id: str | None = None
 
-def process_asr_task(job_id: str, file_path: str, language: str):
+def process_asr_task(job_id: str, file_path: str, language: str, deadline: float | None = None, trace_id: str | None = None):
     asr_api_url = os.getenv(f"ASR_{language}_API_URL")
     asr_access_token = os.getenv(f"ASR_{language}_ACCESS_TOKEN")
 
     if not asr_api_url or not asr_access_token:
-        jobs[job_id]["status"] = "failed"
-        jobs[job_id]["result"] = {"error": "Server configuration error: Missing ASR API credentials"}
+        jobs[job_id].update(status="failed", result={"error": "Server configuration error: Missing ASR API credentials", "kind": "config"})
         return
 
-    print(f"BACKGROUND TASK: Started ASR processing for job: {job_id}")
+    log.emit("job.started", job_id, trace_id, language=language)
+    started = time.perf_counter()
 
     headers = {"access-token": asr_access_token}
 
+    upload = None
     try:
+        # Downmix/resample to what the ASR model expects and trim silence before uploading
+        upload = preprocess_audio(file_path, job_id, trace_id)
+        upload_name = os.path.splitext(os.path.basename(file_path))[0] + ".wav" if upload["temporary"] else os.path.basename(file_path)
+
         # The API expects the audio file as form-data
-        with open(file_path, "rb") as audio_file:
+        with open(upload["path"], "rb") as audio_file:
             files = {
-                "audio_file": (os.path.basename(file_path), audio_file, "audio/wav")
+                "audio_file": (upload_name, audio_file, upload["mime_type"])
             }
-            response = requests.post(asr_api_url, headers=headers, files=files, verify=False)
+            response = requests.post(asr_api_url, headers=headers, files=files, verify=False, timeout=http_timeout(deadline))
             response.raise_for_status()
 
         api_response_data = response.json()
@@ -45,19 +63,22 @@ def process_asr_task(job_id: str, file_path: str, language: str):
         if api_response_data.get("status") == "success":
             # The response key is "recognized_text" according to the docs
             recognized_text = api_response_data["data"]["recognized_text"]
-            jobs[job_id]["status"] = "completed"
-            jobs[job_id]["result"] = {"text": recognized_text}
+            jobs[job_id].update(status="completed", result={
+                "text": recognized_text,
+                "bytes_saved": upload["original_bytes"] - upload["upload_bytes"],
+            })
         else:
             error_message = api_response_data.get("message", "Unknown ASR API error")
-            jobs[job_id]["status"] = "failed"
-            jobs[job_id]["result"] = {"error": error_message}
+            jobs[job_id].update(status="failed", result={"error": error_message})
             
     except Exception as e:
-        print(f"BACKGROUND TASK ERROR: {e}")
-        jobs[job_id]["status"] = "failed"
-        jobs[job_id]["result"] = {"error": str(e)}
+        log.error("job.error", job_id, trace_id, error=str(e))
+        jobs[job_id].update(status="failed", result={"error": str(e)})
+    finally:
+        if upload and upload["temporary"] and os.path.exists(upload["path"]):
+            os.remove(upload["path"])
 
-    print(f"BACKGROUND TASK: Finished ASR processing for job: {job_id}")
+    log.emit("job.finished", job_id, trace_id, status=jobs[job_id]["status"], duration_ms=round((time.perf_counter() - started) * 1000, 1))
 
 @app.post("/api/v1/asr/jobs", response_model=Job, status_code=202)
 async def start_asr_job(request: AsrRequest, background_tasks: BackgroundTasks):
@@ -68,11 +89,10 @@ async def start_asr_job(request: AsrRequest, background_tasks: BackgroundTasks):
     
     # Check if the file exists before starting the background task
     if not os.path.exists(request.audio_file_path):
-        jobs[job_id]["status"] = "failed"
-        jobs[job_id]["result"] = {"error": "File not found"}
+        jobs[job_id].update(status="failed", result={"error": "File not found", "kind": "validation"})
         raise HTTPException(status_code=400, detail=f"File not found at path: {request.audio_file_path}")
     
-    background_tasks.add_task(process_asr_task, job_id, request.audio_file_path, language)
+    background_tasks.add_task(process_asr_task, job_id, request.audio_file_path, language, request.deadline, request.trace_id)
     
     return {"jobId": job_id, "status": "processing", "result": None}
 
@@ -0,0 +1,312 @@
+# backend/benchmarks/load_test.py
+#
+# Load generator for the v2 orchestration service. Drives every v2 pipeline
+# (plus conversation and live-turn) with a fixed concurrency, and writes a JSON
+# report with throughput, latency percentiles and per-process resource use.
+#
+# Typical run, with the services pointed at benchmarks/stub_bhashini.py:
+#   cd backend/
+#   python -m benchmarks.load_test run --requests 40 --concurrency 8 \
+#       --pid v2=$(pgrep -f v2_services.main) --pid mt=$(pgrep -f mt_service.main)
+#
+# Compare two saved runs:
+#   python -m benchmarks.load_test compare benchmarks/results/a.json benchmarks/results/b.json
+
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import json
+import math
+import os
+import statistics
+import threading
+import time
+import requests
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESOURCES_DIR = os.path.join(os.path.dirname(BACKEND_DIR), "test_resources")
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+SAMPLE_IMAGE = os.path.join(RESOURCES_DIR, "images.png")
+SAMPLE_AUDIO = os.path.join(RESOURCES_DIR, "test_audio.wav")
+
+SAMPLE_TEXT = "Please keep the platform clear of the yellow line while the train arrives."
+
+# --- Pipeline definitions ---
+#
+# Each pipeline knows which file (if any) to upload first, and how to build its
+# request body from the uploaded path. Pipelines delete their input file when
+# done, so every request uploads a fresh copy.
+#
+# Every request's input is unique (numbered text, a tagged copy of the sample
+# file), so the v2 stage cache cannot skip stages after the first request and
+# each request measures the full pipeline.
+
+PIPELINES = {
+    "document-translation": {"upload": "image", "path": "/api/v2/document-translation"},
+    "speech-translation": {"upload": "audio", "path": "/api/v2/speech-translation"},
+    "text-to-speech": {"upload": None, "path": "/api/v2/text-to-speech"},
+    "speech-to-speech": {"upload": "audio", "path": "/api/v2/speech-to-speech"},
+    "text-to-text": {"upload": None, "path": "/api/v2/text-to-text"},
+    "image-to-audio": {"upload": "image", "path": "/api/v2/image-to-audio"},
+    "conversation": {"upload": "audio", "path": "/api/v2/conversation"},
+    "live-turn": {"upload": "audio", "path": "/api/v2/live-turn", "sync": True},
+}
+
+
+def build_body(pipeline: str, file_path: str | None, input_language: str, output_language: str, index: int = 0):
+    langs = {"input_language": input_language, "output_language": output_language}
+    text = f"{SAMPLE_TEXT} (request {index})"
+    if pipeline in ("document-translation", "image-to-audio"):
+        return {"image_file_path": file_path, **langs}
+    if pipeline in ("speech-translation",):
+        return {"audio_file_path": file_path, **langs}
+    if pipeline == "speech-to-speech":
+        return {"audio_file_path": file_path, "gender": "female", **langs}
+    if pipeline == "text-to-speech":
+        return {"text": text, "gender": "female", **langs}
+    if pipeline == "text-to-text":
+        return {"text": text, **langs}
+    if pipeline == "conversation":
+        return [{"speaker": "A", "audio_file_path": file_path, "gender": "female", **langs}]
+    if pipeline == "live-turn":
+        return {"speaker": "A", "audio_file_path": file_path, "gender": "female", **langs}
+    raise ValueError(f"Unknown pipeline: {pipeline}")
+
+
+def upload_file(base_url: str, kind: str, index: int = 0) -> str:
+    sample = SAMPLE_IMAGE if kind == "image" else SAMPLE_AUDIO
+    with open(sample, "rb") as f:
+        # Bytes after the PNG IEND / WAV data chunk are ignored by decoders, but make the file content unique
+        content = f.read() + f"\0load-test-{os.getpid()}-{index}-{time.time_ns()}".encode()
+    r = requests.post(f"{base_url}/api/v2/file-upload/{kind}", files={"file": (os.path.basename(sample), content)})
+    r.raise_for_status()
+    return r.json()["file_path"]
+
+
+def run_one(base_url: str, pipeline: str, args, index: int = 0) -> dict:
+    """Runs request number `index` through `pipeline` and returns its latency and outcome."""
+    spec = PIPELINES[pipeline]
+    try:
+        file_path = upload_file(base_url, spec["upload"], index) if spec["upload"] else None
+        body = build_body(pipeline, file_path, args.input_language, args.output_language, index)
+
+        started = time.perf_counter()
+        r = requests.post(base_url + spec["path"], json=body, timeout=args.timeout)
+        r.raise_for_status()
+
+        if not spec.get("sync"):
+            job_url = f"{base_url}{spec['path']}/jobs/{r.json()['jobId']}"
+            while True:
+                if time.perf_counter() - started > args.timeout:
+                    raise TimeoutError(f"{pipeline} job did not finish in {args.timeout}s")
+                data = requests.get(job_url, timeout=args.timeout).json()
+                if data["status"] == "completed":
+                    break
+                if data["status"] in ("failed", "partially_completed", "cancelled"):
+                    raise Exception(f"job failed: {data.get('result')}")
+                time.sleep(args.poll_interval)
+
+        return {"ok": True, "latency": time.perf_counter() - started}
+    except Exception as e:
+        return {"ok": False, "error": str(e)}
+
+
+# --- Resource sampling ---
+
+def read_process_stats(pid: int) -> tuple[float, int]:
+    """Returns (cpu_seconds, rss_bytes) for a process, via psutil or /proc."""
+    if psutil is not None:
+        proc = psutil.Process(pid)
+        cpu = proc.cpu_times()
+        return cpu.user + cpu.system, proc.memory_info().rss
+
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    ticks = os.sysconf("SC_CLK_TCK")
+    cpu_seconds = (int(fields[11]) + int(fields[12])) / ticks
+    rss_bytes = int(fields[21]) * os.sysconf("SC_PAGE_SIZE")
+    return cpu_seconds, rss_bytes
+
+
+class ResourceSampler:
+    """Samples CPU time and RSS of the named service processes while a pipeline runs."""
+
+    def __init__(self, pids: dict[str, int], interval: float = 0.5):
+        self.pids = pids
+        self.interval = interval
+        self._stop = threading.Event()
+        self._start_cpu = {}
+        self._end_cpu = {}
+        self._peak_rss = {}
+
+    def _sample(self):
+        for name, pid in self.pids.items():
+            try:
+                _, rss = read_process_stats(pid)
+                self._peak_rss[name] = max(self._peak_rss.get(name, 0), rss)
+            except Exception:
+                pass
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def __enter__(self):
+        for name, pid in self.pids.items():
+            try:
+                self._start_cpu[name] = read_process_stats(pid)[0]
+            except Exception as e:
+                print(f"LOAD-TEST: Warning: cannot read stats for {name} (pid {pid}): {e}")
+        self._sample()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+        for name, pid in self.pids.items():
+            try:
+                self._end_cpu[name] = read_process_stats(pid)[0]
+            except Exception:
+                pass
+
+    def report(self, elapsed: float) -> dict:
+        report = {}
+        for name in self.pids:
+            if name not in self._start_cpu or name not in self._end_cpu:
+                continue
+            cpu_seconds = self._end_cpu[name] - self._start_cpu[name]
+            report[name] = {
+                "cpu_seconds": round(cpu_seconds, 3),
+                "cpu_percent": round(100 * cpu_seconds / elapsed, 1) if elapsed else 0.0,
+                "peak_rss_mb": round(self._peak_rss.get(name, 0) / (1024 * 1024), 1),
+            }
+        return report
+
+
+# --- Reporting ---
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(outcomes: list[dict], elapsed: float) -> dict:
+    latencies = sorted(o["latency"] * 1000 for o in outcomes if o["ok"])
+    errors = [o["error"] for o in outcomes if not o["ok"]]
+    return {
+        "requests": len(outcomes),
+        "succeeded": len(latencies),
+        "failed": len(errors),
+        "duration_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 3) if elapsed else 0.0,
+        "latency_ms": {
+            "mean": round(statistics.fmean(latencies), 1) if latencies else 0.0,
+            "p50": round(percentile(latencies, 50), 1),
+            "p90": round(percentile(latencies, 90), 1),
+            "p99": round(percentile(latencies, 99), 1),
+            "max": round(latencies[-1], 1) if latencies else 0.0,
+        },
+        "sample_errors": sorted(set(errors))[:5],
+    }
+
+
+def run_benchmark(args):
+    pids = {}
+    for entry in args.pid:
+        name, _, pid = entry.partition("=")
+        pids[name] = int(pid)
+
+    pipelines = list(PIPELINES) if args.pipelines == "all" else args.pipelines.split(",")
+    report = {
+        "meta": {
+            "label": args.label,
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "base_url": args.base_url,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "languages": f"{args.input_language}->{args.output_language}",
+        },
+        "pipelines": {},
+    }
+
+    for pipeline in pipelines:
+        print(f"LOAD-TEST: {pipeline}: {args.requests} requests at concurrency {args.concurrency}")
+        with ResourceSampler(pids) as sampler, ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            started = time.perf_counter()
+            outcomes = list(pool.map(lambda i: run_one(args.base_url, pipeline, args, i), range(args.requests)))
+            elapsed = time.perf_counter() - started
+
+        summary = summarize(outcomes, elapsed)
+        summary["resources"] = sampler.report(elapsed)
+        report["pipelines"][pipeline] = summary
+        lat = summary["latency_ms"]
+        print(f"LOAD-TEST: {pipeline}: {summary['throughput_rps']} req/s, p50 {lat['p50']} ms, p99 {lat['p99']} ms, {summary['failed']} failed")
+
+    os.makedirs(args.out, exist_ok=True)
+    name = f"{time.strftime('%Y%m%d-%H%M%S')}{'-' + args.label if args.label else ''}.json"
+    out_path = os.path.join(args.out, name)
+    with open(out_path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"LOAD-TEST: Report written to {out_path}")
+
+
+def compare_reports(args):
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+
+    def delta(old: float, new: float) -> str:
+        return f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+
+    print(f"{'pipeline':<22} {'req/s':>18} {'p50 ms':>22} {'p99 ms':>22}")
+    for pipeline, new in candidate["pipelines"].items():
+        old = baseline["pipelines"].get(pipeline)
+        if not old:
+            continue
+        cols = []
+        for old_v, new_v in (
+            (old["throughput_rps"], new["throughput_rps"]),
+            (old["latency_ms"]["p50"], new["latency_ms"]["p50"]),
+            (old["latency_ms"]["p99"], new["latency_ms"]["p99"]),
+        ):
+            cols.append(f"{old_v}->{new_v} ({delta(old_v, new_v)})")
+        print(f"{pipeline:<22} {cols[0]:>18} {cols[1]:>22} {cols[2]:>22}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the v2 orchestration service")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="run the benchmark and save a JSON report")
+    run.add_argument("--base-url", default="http://127.0.0.1:5006")
+    run.add_argument("--pipelines", default="all", help=f"comma separated subset of: {','.join(PIPELINES)}")
+    run.add_argument("--requests", type=int, default=20, help="requests per pipeline")
+    run.add_argument("--concurrency", type=int, default=4)
+    run.add_argument("--input-language", default="MALAYALAM")
+    run.add_argument("--output-language", default="ENGLISH")
+    run.add_argument("--poll-interval", type=float, default=0.25)
+    run.add_argument("--timeout", type=float, default=120.0)
+    run.add_argument("--pid", action="append", default=[], help="name=pid of a service process to sample (repeatable)")
+    run.add_argument("--label", default="", help="tag added to the report file name")
+    run.add_argument("--out", default=RESULTS_DIR)
+
+    compare = sub.add_parser("compare", help="compare two saved reports")
+    compare.add_argument("baseline")
+    compare.add_argument("candidate")
+
+    args = parser.parse_args()
+    if args.command == "run":
+        run_benchmark(args)
+    else:
+        compare_reports(args)
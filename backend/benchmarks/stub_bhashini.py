@@ -0,0 +1,156 @@
+# backend/benchmarks/stub_bhashini.py
+#
+# A local stand-in for the Bhashini ASR / MT / OCR / TTS APIs, used for load
+# testing without burning upstream quota. It returns the same response shapes the
+# v1 services parse, with configurable latency and error rates.
+#
+# Run it with:
+#   cd backend/
+#   uvicorn benchmarks.stub_bhashini:app --host 127.0.0.1 --port 5099
+#
+# Then point the v1 services at it (prints `export ...` lines for every language):
+#   python -m benchmarks.stub_bhashini --print-env > stub.env
+
+from fastapi import FastAPI, Request, UploadFile, File
+from fastapi.responses import JSONResponse, Response
+import asyncio
+import argparse
+import io
+import math
+import os
+import random
+import struct
+import uuid
+import wave
+
+app = FastAPI(title="Bhashini Stub (benchmarks)")
+
+LANGUAGES = ["ENGLISH", "HINDI", "KANNADA", "MALAYALAM", "MARATHI"]
+
+# --- Configuration (environment variables) ---
+#
+# STUB_LATENCY_DIST      fixed | uniform | normal | lognormal  (default: lognormal)
+# STUB_LATENCY_MS        mean latency in milliseconds          (default: 300)
+# STUB_LATENCY_SPREAD    spread (uniform half-width / std dev, in ms; sigma for lognormal)
+# STUB_ERROR_RATE        probability of a failed response      (default: 0.0)
+# STUB_HTTP_ERROR_SHARE  share of failures returned as HTTP 503 instead of a
+#                        200 with {"status": "failure"}         (default: 0.5)
+#
+# Every variable can be overridden per API by inserting the API name, e.g.
+# STUB_ASR_LATENCY_MS=1200 or STUB_TTS_ERROR_RATE=0.05.
+
+def _setting(api: str, name: str, default: str) -> str:
+    return os.getenv(f"STUB_{api}_{name}", os.getenv(f"STUB_{name}", default))
+
+
+def sample_latency(api: str) -> float:
+    """Returns a latency in seconds drawn from the configured distribution for `api`."""
+    dist = _setting(api, "LATENCY_DIST", "lognormal").lower()
+    mean_ms = float(_setting(api, "LATENCY_MS", "300"))
+
+    if dist == "fixed":
+        latency_ms = mean_ms
+    elif dist == "uniform":
+        spread = float(_setting(api, "LATENCY_SPREAD", str(mean_ms / 2)))
+        latency_ms = random.uniform(mean_ms - spread, mean_ms + spread)
+    elif dist == "normal":
+        spread = float(_setting(api, "LATENCY_SPREAD", str(mean_ms / 4)))
+        latency_ms = random.gauss(mean_ms, spread)
+    else:
+        # Lognormal with the requested mean: long right tail, like real upstream APIs.
+        sigma = float(_setting(api, "LATENCY_SPREAD", "0.5"))
+        mu = math.log(max(mean_ms, 1.0)) - sigma ** 2 / 2
+        latency_ms = random.lognormvariate(mu, sigma)
+
+    return max(latency_ms, 0.0) / 1000.0
+
+
+async def simulate_upstream(api: str) -> JSONResponse | None:
+    """Sleeps for a sampled latency and returns an error response if this call should fail."""
+    await asyncio.sleep(sample_latency(api))
+
+    if random.random() < float(_setting(api, "ERROR_RATE", "0.0")):
+        if random.random() < float(_setting(api, "HTTP_ERROR_SHARE", "0.5")):
+            return JSONResponse(status_code=503, content={"detail": f"Stub {api} upstream unavailable"})
+        return JSONResponse(content={"status": "failure", "message": f"Stub {api} simulated failure"})
+    return None
+
+
+def make_tone_wav(seconds: float = 1.0, sample_rate: int = 22050) -> bytes:
+    """Builds a short WAV with a quiet 440 Hz tone, so TTS URLs resolve to playable audio."""
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        frames = bytearray()
+        for i in range(int(seconds * sample_rate)):
+            sample = int(800 * math.sin(2 * math.pi * 440 * i / sample_rate))
+            frames += struct.pack("<h", sample)
+        wav.writeframes(bytes(frames))
+    return buffer.getvalue()
+
+STUB_AUDIO = make_tone_wav()
+
+# --- Stub endpoints (same response shapes as the real APIs) ---
+
+@app.post("/asr/{language}")
+async def stub_asr(language: str, audio_file: UploadFile = File(...)):
+    size = len(await audio_file.read())
+    if error := await simulate_upstream("ASR"):
+        return error
+    return {"status": "success", "data": {"recognized_text": f"stub {language.lower()} transcript of {size} bytes"}}
+
+
+@app.post("/mt/{language1}/{language2}")
+async def stub_mt(language1: str, language2: str, request: Request):
+    payload = await request.json()
+    if error := await simulate_upstream("MT"):
+        return error
+    return {"status": "success", "data": {"output_text": f"[{language2.lower()}] {payload.get('input_text', '')}"}}
+
+
+@app.post("/ocr/{language}")
+async def stub_ocr(language: str, file: UploadFile = File(...)):
+    size = len(await file.read())
+    if error := await simulate_upstream("OCR"):
+        return error
+    return {"status": "success", "data": {"decoded_text": f"stub {language.lower()} text from a {size} byte image"}}
+
+
+@app.post("/tts/{language}")
+async def stub_tts(language: str, request: Request):
+    await request.json()
+    if error := await simulate_upstream("TTS"):
+        return error
+    s3_url = str(request.base_url) + f"audio/{uuid.uuid4()}.wav"
+    return {"status": "success", "data": {"s3_url": s3_url}}
+
+
+@app.get("/audio/{name}")
+async def stub_audio(name: str):
+    return Response(content=STUB_AUDIO, media_type="audio/wav")
+
+
+def print_env(base_url: str):
+    """Prints the environment the v1 services need to talk to this stub instead of Bhashini."""
+    for lang in LANGUAGES:
+        for api in ("ASR", "OCR", "TTS"):
+            print(f"export {api}_{lang}_API_URL={base_url}/{api.lower()}/{lang}")
+            print(f"export {api}_{lang}_ACCESS_TOKEN=stub-token")
+        for lang2 in LANGUAGES:
+            if lang2 != lang:
+                print(f"export MT_{lang}_{lang2}_API_URL={base_url}/mt/{lang}/{lang2}")
+                print(f"export MT_{lang}_{lang2}_ACCESS_TOKEN=stub-token")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bhashini stub server helpers")
+    parser.add_argument("--print-env", action="store_true", help="print env exports pointing the v1 services at the stub")
+    parser.add_argument("--base-url", default="http://127.0.0.1:5099")
+    args = parser.parse_args()
+
+    if args.print_env:
+        print_env(args.base_url)
+    else:
+        parser.print_help()
@@ -0,0 +1,180 @@
+# backend/common/audio_store.py
+#
+# Size-bounded local disk store for synthesized TTS audio.
+#
+# The TTS service downloads each upstream `s3_url` into this directory once;
+# the v2 service then serves the file itself (with HTTP Range support), so replay
+# and seeking in the browser never go back to the remote object store, and
+# expiring upstream URLs stop mattering.
+#
+# Both processes share the directory, so the LRU order lives on disk: every
+# read bumps the file's mtime, and eviction removes the oldest files first.
+
+from fastapi import Request
+from fastapi.responses import Response, StreamingResponse
+import os
+import re
+import threading
+import uuid
+import requests
+
+from common.deadlines import DeadlineExceeded, http_timeout, remaining_seconds
+
+AUDIO_STORE_DIR = os.getenv("TTS_AUDIO_STORE_DIR", "")
+AUDIO_STORE_MAX_BYTES = int(os.getenv("TTS_AUDIO_STORE_MAX_MB", "512")) * 1024 * 1024
+
+AUDIO_ID_PATTERN = re.compile(r"^[0-9a-f]{32}\.(wav|mp3|ogg|flac)$")
+MEDIA_TYPES = {"wav": "audio/wav", "mp3": "audio/mpeg", "ogg": "audio/ogg", "flac": "audio/flac"}
+CONTENT_TYPE_EXTENSIONS = {"audio/wav": "wav", "audio/x-wav": "wav", "audio/wave": "wav",
+                           "audio/mpeg": "mp3", "audio/ogg": "ogg", "audio/flac": "flac"}
+CHUNK_SIZE = 64 * 1024
+
+
+class AudioStore:
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def path_for(self, audio_id: str) -> str | None:
+        """Returns the local path of a stored file and marks it as recently used."""
+        if not AUDIO_ID_PATTERN.match(audio_id):
+            return None
+        path = os.path.join(self.directory, audio_id)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def fetch(self, url: str, timeout: float = 30, deadline: float | None = None) -> str:
+        """
+        Downloads `url` into the store and returns its audio id. Raises
+        DeadlineExceeded rather than run past `deadline` (the HTTP timeout only
+        bounds each read, so a slow download is also checked between chunks).
+        """
+        with requests.get(url, stream=True, timeout=http_timeout(deadline, timeout)) as response:
+            response.raise_for_status()
+            content_type = response.headers.get("content-type", "").split(";")[0].strip()
+            ext = CONTENT_TYPE_EXTENSIONS.get(content_type)
+            if not ext:
+                url_ext = os.path.splitext(url.split("?")[0])[1].lstrip(".").lower()
+                ext = url_ext if url_ext in MEDIA_TYPES else "wav"
+
+            audio_id = f"{uuid.uuid4().hex}.{ext}"
+            final_path = os.path.join(self.directory, audio_id)
+            tmp_path = final_path + ".part"
+            try:
+                with open(tmp_path, "wb") as f:
+                    for chunk in response.iter_content(CHUNK_SIZE):
+                        if deadline is not None and remaining_seconds(deadline) <= 0:
+                            raise DeadlineExceeded("Deadline exceeded while storing audio")
+                        f.write(chunk)
+                os.replace(tmp_path, final_path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+        self.evict()
+        return audio_id
+
+    def evict(self):
+        """Removes least recently used files until the store fits in max_bytes."""
+        with self._lock:
+            entries = []
+            total = 0
+            for entry in os.scandir(self.directory):
+                if not entry.is_file() or not AUDIO_ID_PATTERN.match(entry.name):
+                    continue
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+
+            entries.sort()
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                except FileNotFoundError:
+                    pass
+
+
+_store = None
+
+def get_audio_store() -> AudioStore | None:
+    """Returns the shared store, or None when TTS_AUDIO_STORE_DIR is not configured."""
+    global _store
+    if not AUDIO_STORE_DIR:
+        return None
+    if _store is None:
+        _store = AudioStore(AUDIO_STORE_DIR, AUDIO_STORE_MAX_BYTES)
+    return _store
+
+
+# --- Range-request serving ---
+
+def _parse_range(range_header: str, size: int) -> tuple[int, int] | None:
+    """Parses a single `bytes=` range. Returns (start, end) inclusive, or None if unsatisfiable."""
+    match = re.fullmatch(r"bytes=(\d*)-(\d*)", range_header.strip())
+    if not match or match.group(1) == match.group(2) == "":
+        return None
+    start_s, end_s = match.groups()
+    if start_s == "":
+        # Suffix range: the last N bytes.
+        length = int(end_s)
+        if length == 0:
+            return None
+        return max(size - length, 0), size - 1
+    start = int(start_s)
+    end = min(int(end_s), size - 1) if end_s else size - 1
+    if start >= size or start > end:
+        return None
+    return start, end
+
+
+def _iter_file(path: str, start: int, length: int):
+    with open(path, "rb") as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def audio_file_response(request: Request, path: str, audio_id: str) -> Response:
+    """
+    Serves a stored audio file with Range, ETag and long-lived caching headers.
+    Stored files never change (a new synthesis gets a new id), so they are immutable.
+    """
+    size = os.path.getsize(path)
+    etag = f'"{audio_id}-{size}"'
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": etag,
+        "Cache-Control": "public, max-age=31536000, immutable",
+    }
+    media_type = MEDIA_TYPES.get(audio_id.rsplit(".", 1)[-1], "application/octet-stream")
+
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (not if_range or if_range == etag):
+        byte_range = _parse_range(range_header, size)
+        if byte_range is None:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+        start, end = byte_range
+        length = end - start + 1
+        headers.update({"Content-Range": f"bytes {start}-{end}/{size}", "Content-Length": str(length)})
+        body = _iter_file(path, start, length) if request.method != "HEAD" else iter(())
+        return StreamingResponse(body, status_code=206, media_type=media_type, headers=headers)
+
+    headers["Content-Length"] = str(size)
+    body = _iter_file(path, 0, size) if request.method != "HEAD" else iter(())
+    return StreamingResponse(body, status_code=200, media_type=media_type, headers=headers)
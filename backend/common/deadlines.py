@@ -0,0 +1,39 @@
+# backend/common/deadlines.py
+#
+# End-to-end deadlines. A v2 request may carry `deadline_seconds`; it is turned
+# into an absolute epoch time once, at the front door, and that same value is
+# passed down to every v1 job, so each hop knows how much time is left and can
+# size its HTTP/upstream timeouts (or give up) accordingly.
+
+import time
+
+# Timeout for internal/upstream HTTP calls when no deadline applies.
+DEFAULT_HTTP_TIMEOUT = 120.0
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a job runs out of time at a stage boundary."""
+
+
+def make_deadline(deadline_seconds: float | None) -> float | None:
+    """Absolute deadline for a relative budget. Requests reject budgets <= 0, so only None means "no deadline"."""
+    if deadline_seconds is None:
+        return None
+    return time.time() + deadline_seconds
+
+
+def remaining_seconds(deadline: float | None) -> float | None:
+    """Seconds left until `deadline`, or None when there is no deadline."""
+    if deadline is None:
+        return None
+    return deadline - time.time()
+
+
+def http_timeout(deadline: float | None, default: float = DEFAULT_HTTP_TIMEOUT) -> float:
+    """Timeout for one HTTP call: what's left of the deadline, capped at `default`."""
+    remaining = remaining_seconds(deadline)
+    if remaining is None:
+        return default
+    if remaining <= 0:
+        raise DeadlineExceeded("Deadline exceeded")
+    return min(remaining, default)
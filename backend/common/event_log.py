@@ -0,0 +1,160 @@
+# backend/common/event_log.py
+#
+# Structured, low-overhead event log shared by all services.
+#
+# Services used to print() a line for every stage and every poll. print() is a
+# blocking write on the request/pipeline thread, and free-form lines are hard to
+# search. Instead, each service creates an EventLog and emits named events:
+#
+#   log = EventLog("v2")
+#   log.emit("stage.started", job_id=job_id, trace_id=trace_id, stage="MT")
+#
+# emit() only builds a small dict and puts it on a bounded in-memory queue; a
+# background thread serializes records as JSON lines and writes them in batches
+# to stdout (or EVENT_LOG_PATH). When the queue is full, records are dropped and
+# counted instead of blocking the caller. Every record carries job_id and
+# trace_id (the v2 job that started the work), so one request can be followed
+# across all five services.
+#
+# High-frequency events can be sampled with EVENT_LOG_SAMPLE, e.g.
+# "poll=0.1,tts.store=0.5". Sampled records carry their sample_rate. Errors are
+# never sampled, and wait a moment for queue space rather than being dropped.
+
+import atexit
+import json
+import os
+import queue
+import random
+import sys
+import threading
+import time
+
+EVENT_LOG_PATH = os.getenv("EVENT_LOG_PATH", "")  # Empty means stdout.
+EVENT_LOG_BUFFER = int(os.getenv("EVENT_LOG_BUFFER", "10000"))
+EVENT_LOG_FLUSH_SECONDS = float(os.getenv("EVENT_LOG_FLUSH_SECONDS", "0.5"))
+EVENT_LOG_SAMPLE = os.getenv("EVENT_LOG_SAMPLE", "poll=0.1")
+
+MAX_BATCH = 500
+ERROR_WAIT_SECONDS = 0.05
+
+
+def _parse_sample_rates(spec: str) -> dict[str, float]:
+    rates = {}
+    for part in spec.split(","):
+        if "=" in part:
+            event, rate = part.split("=", 1)
+            rates[event.strip()] = min(max(float(rate), 0.0), 1.0)
+    return rates
+
+
+SAMPLE_RATES = _parse_sample_rates(EVENT_LOG_SAMPLE)
+
+
+class _Writer:
+    """Background thread that drains the record queue and writes JSON lines in batches."""
+
+    def __init__(self):
+        self.queue = queue.Queue(maxsize=EVENT_LOG_BUFFER)
+        self.dropped = 0
+        self.pid = None
+        self.thread = None
+        self._start_lock = threading.Lock()
+
+    def ensure_started(self):
+        # Worker processes may be forked after import, and threads do not survive a fork.
+        if self.pid == os.getpid():
+            return
+        with self._start_lock:
+            if self.pid == os.getpid():
+                return
+            self.queue = queue.Queue(maxsize=EVENT_LOG_BUFFER)
+            self.thread = threading.Thread(target=self._run, name="event-log-writer", daemon=True)
+            self.thread.start()
+            self.pid = os.getpid()
+
+    def put(self, record: dict, wait: float = 0.0):
+        self.ensure_started()
+        try:
+            # Only warnings/errors wait (briefly) for room; info records never block.
+            self.queue.put(record, block=wait > 0, timeout=wait or None)
+        except queue.Full:
+            self.dropped += 1
+
+    def _open(self):
+        if EVENT_LOG_PATH:
+            return open(EVENT_LOG_PATH, "a", encoding="utf-8")
+        return sys.stdout
+
+    def _run(self):
+        stream = self._open()
+        while True:
+            try:
+                batch = [self.queue.get(timeout=EVENT_LOG_FLUSH_SECONDS)]
+            except queue.Empty:
+                continue
+            while len(batch) < MAX_BATCH:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            taken = len(batch)
+            self._write(stream, batch)
+            for _ in range(taken):
+                self.queue.task_done()
+
+    def _write(self, stream, batch: list[dict]):
+        if self.dropped:
+            dropped, self.dropped = self.dropped, 0
+            batch.append({"ts": time.time(), "service": "event_log", "event": "log.dropped", "level": "warning",
+                          "job_id": None, "trace_id": None, "count": dropped})
+        lines = [json.dumps(record, ensure_ascii=False, default=str) for record in batch]
+        try:
+            stream.write("\n".join(lines) + "\n")
+            stream.flush()
+        except Exception:
+            # Logging must never take a service down.
+            pass
+
+    def drain(self, timeout: float = 2.0):
+        """Waits (briefly) for queued records to be written; used at exit."""
+        if self.pid != os.getpid() or not self.thread.is_alive():
+            return
+        deadline = time.monotonic() + timeout
+        while self.queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+
+_writer = _Writer()
+atexit.register(_writer.drain)
+
+
+class EventLog:
+    """Emits structured events for one service."""
+
+    def __init__(self, service: str):
+        self.service = service
+
+    def emit(self, event: str, job_id: str | None = None, trace_id: str | None = None, level: str = "info", **fields):
+        rate = SAMPLE_RATES.get(event, 1.0) if level == "info" else 1.0
+        if rate < 1.0:
+            if random.random() >= rate:
+                return
+            fields["sample_rate"] = rate
+        record = {
+            "ts": time.time(),
+            "service": self.service,
+            "event": event,
+            "level": level,
+            "job_id": job_id,
+            "trace_id": trace_id or job_id,
+        }
+        for key, value in fields.items():
+            # A field never overwrites the record's own keys; it is kept as field_<key>
+            record[f"field_{key}" if key in record else key] = value
+        _writer.put(record, wait=0.0 if level == "info" else ERROR_WAIT_SECONDS)
+
+    def warning(self, event: str, job_id: str | None = None, trace_id: str | None = None, **fields):
+        self.emit(event, job_id, trace_id, level="warning", **fields)
+
+    def error(self, event: str, job_id: str | None = None, trace_id: str | None = None, **fields):
+        self.emit(event, job_id, trace_id, level="error", **fields)
@@ -0,0 +1,217 @@
+# backend/common/job_state.py
+#
+# Pluggable job-state storage shared by all five services.
+#
+# Every service keeps a `jobs` mapping of job_id -> {"status", "result"}. With
+# the default in-memory dict, a status GET that lands on a different uvicorn
+# worker than the POST gets a 404. Setting JOB_STATE_BACKEND switches `jobs` to a
+# store every worker process sees:
+#
+#   memory  plain dict, single process (default)
+#   sqlite  local SQLite file in WAL mode (JOB_STATE_DB), for several workers on one host
+#   redis   any Redis-compatible server (JOB_STATE_REDIS_URL), for several hosts
+#
+# The stores behave like the dict they replace: `jobs[job_id] = {...}`,
+# `jobs.get(job_id)`, and `jobs[job_id]["status"] = ...` all work. Item
+# assignment and .update() on a job write straight through to the backend, and
+# change only the given fields in one atomic write: set status and result
+# together with `jobs[job_id].update(status=..., result=...)`, so no reader ever
+# sees one without the other, and writers of different fields (a cancel,
+# progress counters) never overwrite each other.
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+JOB_STATE_BACKEND = os.getenv("JOB_STATE_BACKEND", "memory").lower()
+JOB_STATE_DB = os.getenv("JOB_STATE_DB", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "job_state.db"))
+JOB_STATE_REDIS_URL = os.getenv("JOB_STATE_REDIS_URL", "redis://127.0.0.1:6379/0")
+# Finished jobs are only polled for a short while; old state is dropped after this.
+JOB_STATE_TTL_SECONDS = int(os.getenv("JOB_STATE_TTL_SECONDS", str(24 * 3600)))
+
+
+class _JobRecord(dict):
+    """A job's state dict that writes every change straight through to its store."""
+
+    def __init__(self, store, job_id: str, data: dict):
+        super().__init__(data)
+        self._store = store
+        self._job_id = job_id
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self._store._update(self._job_id, {key: value})
+
+    def update(self, *args, **kwargs):
+        fields = dict(*args, **kwargs)
+        super().update(fields)
+        self._store._update(self._job_id, fields)
+
+
+class _SharedJobStore:
+    """Dict-like base class; subclasses implement _load, _save, _update and _append."""
+
+    def __init__(self, namespace: str):
+        self.namespace = namespace
+
+    def get(self, job_id: str, default=None):
+        data = self._load(job_id)
+        if data is None:
+            return default
+        return _JobRecord(self, job_id, data)
+
+    def __getitem__(self, job_id: str):
+        if (record := self.get(job_id)) is None:
+            raise KeyError(job_id)
+        return record
+
+    def __setitem__(self, job_id: str, state: dict):
+        self._save(job_id, dict(state))
+
+    def __contains__(self, job_id: str) -> bool:
+        return self._load(job_id) is not None
+
+
+class SqliteJobStore(_SharedJobStore):
+    PRUNE_EVERY = 500
+
+    def __init__(self, namespace: str, path: str = JOB_STATE_DB):
+        super().__init__(namespace)
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS job_states ("
+                "namespace TEXT NOT NULL, job_id TEXT NOT NULL, state TEXT NOT NULL, updated_at REAL NOT NULL, "
+                "PRIMARY KEY (namespace, job_id))"
+            )
+            self._local.conn = conn
+        return conn
+
+    def _load(self, job_id: str) -> dict | None:
+        row = self._connect().execute(
+            "SELECT state FROM job_states WHERE namespace = ? AND job_id = ?", (self.namespace, job_id)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _save(self, job_id: str, state: dict):
+        conn = self._connect()
+        conn.execute(
+            "INSERT INTO job_states (namespace, job_id, state, updated_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(namespace, job_id) DO UPDATE SET state = excluded.state, updated_at = excluded.updated_at",
+            (self.namespace, job_id, json.dumps(state), time.time()),
+        )
+        self._prune(conn)
+
+    def _update(self, job_id: str, fields: dict):
+        # json_set rewrites only these keys, inside a single UPDATE
+        paths, params = [], []
+        for key, value in fields.items():
+            paths.append("?, json(?)")
+            params += [f'$."{key}"', json.dumps(value)]
+        conn = self._connect()
+        conn.execute(
+            f"UPDATE job_states SET state = json_set(state, {', '.join(paths)}), updated_at = ? "
+            "WHERE namespace = ? AND job_id = ?",
+            (*params, time.time(), self.namespace, job_id),
+        )
+        self._prune(conn)
+
+    def _append(self, job_id: str, key: str, value):
+        path = f'$."{key}"'
+        self._connect().execute(
+            "UPDATE job_states SET state = json_set(state, ?, json_insert(COALESCE(json_extract(state, ?), '[]'), '$[#]', json(?))), "
+            "updated_at = ? WHERE namespace = ? AND job_id = ?",
+            (path, path, json.dumps(value), time.time(), self.namespace, job_id),
+        )
+
+    def _prune(self, conn: sqlite3.Connection):
+        self._writes += 1
+        if self._writes % self.PRUNE_EVERY == 0:
+            conn.execute(
+                "DELETE FROM job_states WHERE namespace = ? AND updated_at < ?",
+                (self.namespace, time.time() - JOB_STATE_TTL_SECONDS),
+            )
+
+
+class RedisJobStore(_SharedJobStore):
+    def __init__(self, namespace: str, url: str = JOB_STATE_REDIS_URL):
+        if redis is None:
+            raise RuntimeError("JOB_STATE_BACKEND=redis requires the 'redis' package")
+        super().__init__(namespace)
+        self.client = redis.Redis.from_url(url)
+
+    def _key(self, job_id: str) -> str:
+        return f"jobs:{self.namespace}:{job_id}"
+
+    # A job is a hash with one JSON-encoded value per field, so each field can be set on its own.
+
+    def _load(self, job_id: str) -> dict | None:
+        fields = self.client.hgetall(self._key(job_id))
+        return {k.decode(): json.loads(v) for k, v in fields.items()} if fields else None
+
+    def _save(self, job_id: str, state: dict):
+        key = self._key(job_id)
+        pipe = self.client.pipeline()
+        pipe.delete(key)
+        pipe.hset(key, mapping={k: json.dumps(v) for k, v in state.items()})
+        pipe.expire(key, JOB_STATE_TTL_SECONDS)
+        pipe.execute()
+
+    def _update(self, job_id: str, fields: dict):
+        key = self._key(job_id)
+        pipe = self.client.pipeline()
+        pipe.hset(key, mapping={k: json.dumps(v) for k, v in fields.items()})
+        pipe.expire(key, JOB_STATE_TTL_SECONDS)
+        pipe.execute()
+
+    def _append(self, job_id: str, field: str, value):
+        key = self._key(job_id)
+
+        def append(pipe):
+            raw = pipe.hget(key, field)
+            items = json.loads(raw) if raw is not None else []
+            pipe.multi()
+            pipe.hset(key, field, json.dumps([*items, value]))
+
+        # Retried by redis-py if another writer touches the job in between (WATCH)
+        self.client.transaction(append, key)
+
+
+_memory_lock = threading.Lock()
+
+
+def append_to_job(store, job_id: str, key: str, value):
+    """Appends `value` to the list in job[key] (created if missing), atomically in every backend."""
+    if isinstance(store, _SharedJobStore):
+        store._append(job_id, key, value)
+        return
+    with _memory_lock:
+        if (job := store.get(job_id)) is not None:
+            job[key] = [*job.get(key, []), value]
+
+
+def create_job_store(namespace: str, backend: str | None = None):
+    """Returns the `jobs` mapping for a service, using JOB_STATE_BACKEND unless `backend` is given."""
+    backend = (backend or JOB_STATE_BACKEND).lower()
+    if backend == "sqlite":
+        return SqliteJobStore(namespace)
+    if backend == "redis":
+        return RedisJobStore(namespace)
+    if backend == "memory":
+        return {}
+    raise ValueError(f"Unknown JOB_STATE_BACKEND: {backend}")
@@ -0,0 +1,244 @@
+# backend/common/profiling.py
+#
+# On-demand, admin-only profiling for a live service.
+#
+#   install_profiling(app)
+#
+# Nothing is installed unless PROFILING_ADMIN_TOKEN is set, so a service without
+# the token has no extra routes, middleware or threads. With it set:
+#
+#   POST /admin/profile?seconds=10       profile the whole process for N seconds
+#   any request with X-Profile: <token>  profile just that request; the response
+#                                        carries X-Profile-Id for the next route
+#                                        (v1 background tasks run after the response,
+#                                        so use the timed profile for those)
+#   GET  /admin/profiles/{profile_id}    fetch a per-request profile
+#
+# Admin routes need the X-Admin-Token header. While a profile runs, a sampler
+# thread reads every thread's stack (sys._current_frames) every
+# PROFILING_INTERVAL_MS. A heartbeat on the event loop detects loop stalls, and
+# for each stall the blocked loop thread's stack is recorded. The report holds:
+#
+#   collapsed  "thread;outer;...;inner count" lines, the input format of
+#              flamegraph.pl, speedscope and inferno (?format=collapsed returns
+#              just this, as text/plain)
+#   threads    per thread pool: thread count and the share of samples in which
+#              its threads were busy rather than waiting for work
+#   stalls     event-loop stalls longer than PROFILING_STALL_MS, with duration and stack
+
+from collections import Counter, OrderedDict
+from fastapi import APIRouter, Header, HTTPException, Request
+from fastapi.responses import PlainTextResponse
+import asyncio
+import hmac
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+
+PROFILING_ADMIN_TOKEN = os.getenv("PROFILING_ADMIN_TOKEN", "")
+PROFILING_INTERVAL_MS = float(os.getenv("PROFILING_INTERVAL_MS", "5"))
+PROFILING_STALL_MS = float(os.getenv("PROFILING_STALL_MS", "100"))
+PROFILING_MAX_SECONDS = float(os.getenv("PROFILING_MAX_SECONDS", "60"))
+
+# Per-request profiles kept for GET /admin/profiles/{id}
+MAX_STORED_PROFILES = 20
+HEARTBEAT_SECONDS = 0.01
+
+# Innermost functions that mean "this thread is parked waiting for work"
+IDLE_FUNCTIONS = {"wait", "get", "select", "poll", "epoll", "accept", "_worker", "sleep", "acquire", "_wait_for_tstate_lock"}
+POOL_NAME_RE = re.compile(r"[_-]?\d+$")
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _stack(frame) -> list[str]:
+    stack = []
+    while frame is not None:
+        stack.append(_frame_label(frame))
+        frame = frame.f_back
+    stack.reverse()
+    return stack
+
+
+def _pool_name(thread_name: str) -> str:
+    """'ThreadPoolExecutor-0_3' -> 'ThreadPoolExecutor-0', 'AnyIO worker thread' stays as is."""
+    return POOL_NAME_RE.sub("", thread_name)
+
+
+class ProfileSession:
+    """One profiling run: a sampler thread plus an event-loop stall watchdog."""
+
+    def __init__(self, interval_ms: float = PROFILING_INTERVAL_MS, stall_ms: float = PROFILING_STALL_MS):
+        self.interval = interval_ms / 1000
+        self.stall_seconds = stall_ms / 1000
+        self.loop_thread_id = threading.get_ident()
+        self.last_beat = time.monotonic()
+        self.stacks = Counter()
+        self.pool_samples: dict[str, Counter] = {}
+        self.pool_threads: dict[str, set] = {}
+        self.stalls = []
+        self.samples = 0
+        self.started = None
+        self.stopped = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    # --- event loop side ---
+
+    async def heartbeat(self):
+        while not self._stop.is_set():
+            self.last_beat = time.monotonic()
+            await asyncio.sleep(HEARTBEAT_SECONDS)
+
+    # --- sampler thread ---
+
+    def start(self):
+        self.started = time.time()
+        self._thread = threading.Thread(target=self._sample_loop, name="profiler-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> dict:
+        self._stop.set()
+        self._thread.join()
+        self.stopped = time.time()
+        return self.report()
+
+    def _sample_loop(self):
+        own_id = threading.get_ident()
+        stall_started, stall_stack = None, None
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            frames = sys._current_frames()
+            self.samples += 1
+            for thread_id, frame in frames.items():
+                if thread_id == own_id:
+                    continue
+                name = names.get(thread_id, f"thread-{thread_id}")
+                if thread_id == self.loop_thread_id:
+                    name = "event-loop"
+                stack = _stack(frame)
+                self.stacks[";".join([name, *stack])] += 1
+
+                pool = _pool_name(name)
+                idle = frame.f_code.co_name in IDLE_FUNCTIONS
+                self.pool_samples.setdefault(pool, Counter())["idle" if idle else "busy"] += 1
+                self.pool_threads.setdefault(pool, set()).add(thread_id)
+
+            # Event-loop stall: the heartbeat coroutine has not run for too long
+            lag = time.monotonic() - self.last_beat
+            if lag > self.stall_seconds:
+                if stall_started is None:
+                    stall_started = self.last_beat
+                if (loop_frame := frames.get(self.loop_thread_id)) is not None:
+                    stall_stack = _stack(loop_frame)
+            elif stall_started is not None:
+                self.stalls.append({"duration_ms": round((time.monotonic() - stall_started) * 1000, 1), "stack": stall_stack})
+                stall_started, stall_stack = None, None
+
+    def report(self) -> dict:
+        threads = {
+            pool: {
+                "threads": len(self.pool_threads[pool]),
+                "busy_ratio": round(counts["busy"] / max(1, counts["busy"] + counts["idle"]), 3),
+            }
+            for pool, counts in self.pool_samples.items()
+        }
+        return {
+            "duration_seconds": round((self.stopped or time.time()) - self.started, 3),
+            "interval_ms": self.interval * 1000,
+            "samples": self.samples,
+            "threads": threads,
+            "stalls": self.stalls,
+            "collapsed": "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common()),
+        }
+
+
+# Only one profiling session runs at a time per process.
+_session_lock = asyncio.Lock()
+_stored_profiles: OrderedDict = OrderedDict()
+
+
+def _check_admin(token: str | None):
+    if not token or not hmac.compare_digest(token, PROFILING_ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+
+def _render(report: dict, format: str):
+    if format == "collapsed":
+        return PlainTextResponse(report["collapsed"] + "\n")
+    return report
+
+
+router = APIRouter(prefix="/admin", tags=["Admin"])
+
+
+@router.post("/profile")
+async def profile_process(
+    seconds: float = 10,
+    interval_ms: float = PROFILING_INTERVAL_MS,
+    format: str = "json",
+    x_admin_token: str | None = Header(None),
+):
+    """Samples every thread of this process for `seconds` and returns the report."""
+    _check_admin(x_admin_token)
+    if not 0 < seconds <= PROFILING_MAX_SECONDS:
+        raise HTTPException(status_code=400, detail=f"seconds must be between 0 and {PROFILING_MAX_SECONDS}")
+    if _session_lock.locked():
+        raise HTTPException(status_code=409, detail="A profile is already running")
+
+    async with _session_lock:
+        session = ProfileSession(max(interval_ms, 1.0))
+        session.start()
+        heartbeat = asyncio.create_task(session.heartbeat())
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            report = await asyncio.to_thread(session.stop)
+            await heartbeat
+    return _render(report, format)
+
+
+@router.get("/profiles/{profile_id}")
+async def get_request_profile(profile_id: str, format: str = "json", x_admin_token: str | None = Header(None)):
+    _check_admin(x_admin_token)
+    if (report := _stored_profiles.get(profile_id)) is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return _render(report, format)
+
+
+async def _profile_request_middleware(request: Request, call_next):
+    token = request.headers.get("x-profile")
+    if token is None or not hmac.compare_digest(token, PROFILING_ADMIN_TOKEN) or _session_lock.locked():
+        return await call_next(request)
+
+    async with _session_lock:
+        session = ProfileSession()
+        session.start()
+        heartbeat = asyncio.create_task(session.heartbeat())
+        try:
+            response = await call_next(request)
+        finally:
+            report = await asyncio.to_thread(session.stop)
+            await heartbeat
+
+    profile_id = str(uuid.uuid4())
+    report["request"] = f"{request.method} {request.url.path}"
+    _stored_profiles[profile_id] = report
+    while len(_stored_profiles) > MAX_STORED_PROFILES:
+        _stored_profiles.popitem(last=False)
+    response.headers["X-Profile-Id"] = profile_id
+    return response
+
+
+def install_profiling(app):
+    """Adds the admin profiling routes and the X-Profile middleware, if PROFILING_ADMIN_TOKEN is set."""
+    if not PROFILING_ADMIN_TOKEN:
+        return
+    app.include_router(router)
+    app.middleware("http")(_profile_request_middleware)
@@ -3,12 +3,22 @@ from pydantic import BaseModel
 import uuid
 import os
 import requests
+import time
+from common.job_state import create_job_store
+from common.deadlines import http_timeout
+from common.event_log import EventLog
+from common.profiling import install_profiling
+from .translation_memory import memory, TM_MODE, TM_SUGGEST_THRESHOLD, TM_REUSE_THRESHOLD
+from .segmentation import split_text, join_segments, translate_segments, SEGMENT_MAX_CHARS
 
 app = FastAPI()
+install_profiling(app)
 
-# In-memory dictionary to store job statuses.
-# In a production environment, you would use a more persistent store like Redis or a database.
-jobs = {}
+log = EventLog("mt")
+
+# Job statuses: in memory by default, or a SQLite/Redis store shared by all
+# uvicorn workers when JOB_STATE_BACKEND is set (see common/job_state.py).
+jobs = create_job_store("mt")
 
 # --- Pydantic Models ---
 
@@ -23,11 +33,61 @@ class TranslationRequest(BaseModel):
     text: str
     language1: str
     language2: str
+    # Absolute epoch time passed down by the orchestrator; the job gives up once it has passed
+    deadline: float | None = None
+    # The v2 job this belongs to, carried on every log record
+    trace_id: str | None = None
 
 
 # --- Background Task Logic ---
 
-def process_translation_task(job_id: str, text: str, language1: str, language2: str):
+def tm_lookup(job_id: str, trace_id: str | None, language1: str, language2: str, text: str, threshold: float) -> dict | None:
+    """Looks text up in the translation memory; a TM failure counts as a miss."""
+    try:
+        return memory.lookup(language1, language2, text, threshold)
+    except Exception as e:
+        log.warning("tm.failed", job_id, trace_id, operation="lookup", error=str(e))
+        return None
+
+
+def tm_add(job_id: str, trace_id: str | None, language1: str, language2: str, source: str, translation: str):
+    """Stores a translation in the translation memory without failing the job if that breaks."""
+    try:
+        memory.add(language1, language2, source, translation)
+    except Exception as e:
+        log.warning("tm.failed", job_id, trace_id, operation="add", error=str(e))
+
+
+def call_mt_api(api_url: str, access_token: str, text: str, deadline: float | None = None) -> str:
+    """Translates one piece of text with the Bhashini MT API and returns the output text."""
+    headers = {"access-token": access_token}
+    payload = {"input_text": text}
+
+    # verify=False is used here as in the original code, but be cautious with this in production.
+    response = requests.post(api_url, headers=headers, json=payload, verify=False, timeout=http_timeout(deadline))
+    response.raise_for_status()  # Raise an exception for bad status codes (4xx or 5xx)
+
+    api_response_data = response.json()
+
+    # Check the status within the API response body
+    if api_response_data.get("status") == "success":
+        return api_response_data["data"]["output_text"]
+    error_message = api_response_data.get("message", "Unknown Bhashini API error")
+    raise Exception(f"Bhashini API Error: {error_message}")
+
+
+def reuse_segments(job_id: str, trace_id: str | None, segments: list[str], language1: str, language2: str) -> dict[int, str]:
+    """In reuse mode, the segments whose translation the translation memory already has (index -> translation)."""
+    known = {}
+    if TM_MODE == "reuse":
+        for i, segment in enumerate(segments):
+            tm_match = tm_lookup(job_id, trace_id, language1, language2, segment, TM_REUSE_THRESHOLD)
+            if tm_match and tm_match["reusable"]:
+                known[i] = tm_match["translation"]
+    return known
+
+
+def process_translation_task(job_id: str, text: str, language1: str, language2: str, deadline: float | None = None, trace_id: str | None = None):
     """
     This function runs in the background to process the translation request.
     It calls the external Bhashini MT API and updates the job status upon completion or failure.
@@ -35,46 +95,62 @@ def process_translation_task(job_id: str, text: str, language1: str, language2:
     lang1_upper = language1.upper()
     lang2_upper = language2.upper()
 
-    print(f"BACKGROUND TASK: Started translation for job: {job_id}")
+    log.emit("job.started", job_id, trace_id, language1=lang1_upper, language2=lang2_upper, chars=len(text))
+    started = time.perf_counter()
+
+    # Check the translation memory for a near-duplicate of this segment first
+    tm_match = None
+    if TM_MODE != "off":
+        tm_match = tm_lookup(job_id, trace_id, lang1_upper, lang2_upper, text, min(TM_SUGGEST_THRESHOLD, TM_REUSE_THRESHOLD))
+        if tm_match and TM_MODE == "reuse" and tm_match["reusable"] and tm_match["similarity"] >= TM_REUSE_THRESHOLD:
+            log.emit("tm.reuse", job_id, trace_id, similarity=tm_match["similarity"])
+            jobs[job_id].update(status="completed", result={"translatedText": tm_match["translation"], "tmMatch": tm_match})
+            return
+        if tm_match and tm_match["similarity"] < TM_SUGGEST_THRESHOLD:
+            tm_match = None
 
     mt_api_url = os.getenv(f"MT_{lang1_upper}_{lang2_upper}_API_URL")
     mt_access_token = os.getenv(f"MT_{lang1_upper}_{lang2_upper}_ACCESS_TOKEN")
 
     # Handle configuration errors
     if not mt_api_url or not mt_access_token:
-        print(f"BACKGROUND TASK ERROR: Server configuration error for job {job_id}")
-        jobs[job_id]["status"] = "failed"
-        jobs[job_id]["result"] = {"error": "Server configuration error: Missing API URL or Token"}
+        log.error("job.error", job_id, trace_id, error="missing API URL or token")
+        jobs[job_id].update(status="failed", result={"error": "Server configuration error: Missing API URL or Token", "kind": "config"})
         return
 
-    headers = {"access-token": mt_access_token}
-    payload = {"input_text": text}
-
     try:
-        # Call the external Bhashini MT API
-        # verify=False is used here as in the original code, but be cautious with this in production.
-        response = requests.post(mt_api_url, headers=headers, json=payload, verify=False)
-        response.raise_for_status()  # Raise an exception for bad status codes (4xx or 5xx)
-        
-        api_response_data = response.json()
-
-        # Check the status within the API response body
-        if api_response_data.get("status") == "success":
-            translated_text = api_response_data["data"]["output_text"]
-            jobs[job_id]["status"] = "completed"
-            jobs[job_id]["result"] = {"translatedText": translated_text}
+        if len(text) <= SEGMENT_MAX_CHARS:
+            # Call the external Bhashini MT API
+            translated_text = call_mt_api(mt_api_url, mt_access_token, text, deadline)
+            result = {"translatedText": translated_text}
         else:
-            error_message = api_response_data.get("message", "Unknown Bhashini API error")
-            jobs[job_id]["status"] = "failed"
-            jobs[job_id]["result"] = {"error": f"Bhashini API Error: {error_message}"}
+            # Long text: translate sentence/paragraph segments in parallel and stitch them back together
+            segments, layout = split_text(text)
+            log.emit("segments.split", job_id, trace_id, segments=len(segments), chars=len(text))
+            known = reuse_segments(job_id, trace_id, segments, lang1_upper, lang2_upper)
+
+            def remember(i: int, translated: str):
+                if TM_MODE != "off":
+                    tm_add(job_id, trace_id, lang1_upper, lang2_upper, segments[i], translated)
+
+            translations = translate_segments(job_id, trace_id, segments,
+                                              lambda segment: call_mt_api(mt_api_url, mt_access_token, segment, deadline),
+                                              known, remember, deadline)
+            translated_text = join_segments(translations, layout)
+            result = {"translatedText": translated_text, "segments": len(segments), "segmentsReused": len(known)}
+
+        if tm_match:
+            result["tmMatch"] = tm_match
+        if TM_MODE != "off":
+            tm_add(job_id, trace_id, lang1_upper, lang2_upper, text, translated_text)
+        jobs[job_id].update(status="completed", result=result)
 
     except Exception as e:
         # Catch any exception during the API call or response processing
-        print(f"BACKGROUND TASK ERROR: An exception occurred for job {job_id}: {e}")
-        jobs[job_id]["status"] = "failed"
-        jobs[job_id]["result"] = {"error": str(e)}
+        log.error("job.error", job_id, trace_id, error=str(e))
+        jobs[job_id].update(status="failed", result={"error": str(e)})
 
-    print(f"BACKGROUND TASK: Finished translation processing for job: {job_id}")
+    log.emit("job.finished", job_id, trace_id, status=jobs[job_id]["status"], duration_ms=round((time.perf_counter() - started) * 1000, 1))
 
 
 # --- API Endpoints ---
@@ -94,7 +170,9 @@ async def start_translation_job(request: TranslationRequest, background_tasks: B
         job_id,
         request.text,
         request.language1,
-        request.language2
+        request.language2,
+        request.deadline,
+        request.trace_id
     )
 
     return {"jobId": job_id, "status": "processing", "result": None}
@@ -0,0 +1,146 @@
+# backend/mt_service/segmentation.py
+#
+# Length-aware segmentation for long MT inputs.
+#
+# Full OCR pages and long ASR transcripts used to go upstream as one
+# input_text: slow, at risk of upstream length limits, and a single failure
+# lost the whole text. split_text() cuts such text into segments of at most
+# MT_SEGMENT_MAX_CHARS characters, which the service translates concurrently:
+#
+#   - paragraphs (blank-line separated) are never merged into one segment
+#   - inside a paragraph, whole sentences are packed greedily into segments
+#     (sentence ends: . ! ? and the Devanagari danda । ॥)
+#   - a sentence longer than the limit is cut at the last space before it
+#
+# Whitespace between segments (paragraph breaks, line breaks, indentation) is
+# never sent upstream. It is kept in the layout and put back verbatim by
+# join_segments(), so the translation keeps the original line structure.
+#
+# translate_segments() sends the segments upstream in parallel and retries
+# only the ones that failed.
+
+from concurrent.futures import ThreadPoolExecutor
+import os
+import re
+import time
+from typing import Callable
+
+from common.deadlines import DeadlineExceeded, remaining_seconds
+from common.event_log import EventLog
+
+SEGMENT_MAX_CHARS = int(os.getenv("MT_SEGMENT_MAX_CHARS", "1000"))
+SEGMENT_MAX_PARALLEL = int(os.getenv("MT_SEGMENT_MAX_PARALLEL", "4"))
+# Extra attempts for segments that failed; segments that succeeded are never re-sent.
+SEGMENT_RETRIES = int(os.getenv("MT_SEGMENT_RETRIES", "2"))
+
+log = EventLog("mt")
+
+PARAGRAPH_RE = re.compile(r"(\n[ \t]*\n\s*)")
+SENTENCE_END_RE = re.compile(r"(?<=[.!?।॥])(\s+)")
+
+
+def _hard_split(sentence: str, max_chars: int) -> list[str]:
+    """Cuts an over-long sentence into chunks of at most max_chars, at spaces where possible."""
+    chunks = []
+    while len(sentence) > max_chars:
+        cut = sentence.rfind(" ", 0, max_chars + 1)
+        if cut <= 0:
+            cut = max_chars
+        chunks.append(sentence[:cut])
+        sentence = sentence[cut:]
+    chunks.append(sentence)
+    return chunks
+
+
+def split_text(text: str, max_chars: int = SEGMENT_MAX_CHARS) -> tuple[list[str], list]:
+    """
+    Returns (segments, layout). `segments` are the stripped pieces to translate;
+    `layout` is a list of literal whitespace strings and segment indexes, in order.
+    """
+    segments, layout = [], []
+
+    def add_literal(whitespace: str):
+        if whitespace:
+            layout.append(whitespace)
+
+    def add_segment(piece: str):
+        core = piece.strip()
+        if not core:
+            add_literal(piece)
+            return
+        start = piece.index(core)
+        add_literal(piece[:start])
+        layout.append(len(segments))
+        segments.append(core)
+        add_literal(piece[start + len(core):])
+
+    for i, paragraph in enumerate(PARAGRAPH_RE.split(text)):
+        if i % 2:
+            add_literal(paragraph)
+            continue
+
+        # Alternating sentence, whitespace, sentence, ...
+        parts = SENTENCE_END_RE.split(paragraph)
+        current = ""
+        for j, part in enumerate(parts):
+            chunks = [part] if j % 2 else _hard_split(part, max_chars)
+            for chunk in chunks:
+                if current.strip() and len(current.lstrip()) + len(chunk.rstrip()) > max_chars:
+                    add_segment(current)
+                    current = ""
+                current += chunk
+        add_segment(current)
+
+    return segments, layout
+
+
+def join_segments(translations: list[str], layout: list) -> str:
+    """Rebuilds the text from per-segment translations and the original whitespace."""
+    return "".join(translations[item] if isinstance(item, int) else item for item in layout)
+
+
+def translate_segments(job_id: str, trace_id: str | None, segments: list[str], translate: Callable[[str], str],
+                       known: dict[int, str] | None = None, on_translated: Callable[[int, str], None] | None = None,
+                       deadline: float | None = None) -> list[str]:
+    """
+    Translates segments concurrently with translate(segment). Segments in `known`
+    (index -> translation) are not sent; on_translated(index, translation) is
+    called for each new one. Failed segments are retried on their own, up to
+    MT_SEGMENT_RETRIES times. Raises if any segment still fails.
+    """
+    translations = [None] * len(segments)
+    for i, translation in (known or {}).items():
+        translations[i] = translation
+
+    def attempt_one(i: int):
+        try:
+            return i, translate(segments[i]), None
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            return i, None, e
+
+    pending = [i for i, translation in enumerate(translations) if translation is None]
+    errors = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(SEGMENT_MAX_PARALLEL, len(pending)))) as pool:
+        for attempt in range(SEGMENT_RETRIES + 1):
+            if not pending:
+                break
+            if attempt:
+                log.warning("segments.retry", job_id, trace_id, failed=len(pending), attempt=attempt)
+                remaining = remaining_seconds(deadline)
+                time.sleep(0.5 * attempt if remaining is None else max(0.0, min(0.5 * attempt, remaining)))
+
+            errors = {}
+            for i, translated, error in pool.map(attempt_one, pending):
+                if error is None:
+                    translations[i] = translated
+                    if on_translated is not None:
+                        on_translated(i, translated)
+                else:
+                    errors[i] = error
+            pending = sorted(errors)
+
+    if pending:
+        raise Exception(f"{len(pending)} of {len(segments)} segments failed to translate: {errors[pending[0]]}")
+    return translations
@@ -0,0 +1,219 @@
+# backend/mt_service/translation_memory.py
+#
+# Fuzzy translation memory (TM) for near-duplicate segments.
+#
+# Much of our OCR/ASR text repeats earlier inputs with small changes: the same
+# sign with another platform number, the same form with a typo. Exact caching
+# misses those, so previously translated segments are indexed with MinHash over
+# character 3-grams and bucketed with LSH (locality-sensitive hashing):
+#
+#   - every segment gets a 32-value MinHash signature, computed with
+#     one-permutation hashing: each shingle is hashed once and lands in one of
+#     32 bins, so the cost is linear in the text length rather than 32x that
+#   - the signature is cut into 8 bands of 4 values; each band is a dict key
+#   - a lookup only compares against segments that share at least one band,
+#     and buckets are capped, so its cost does not depend on how many segments
+#     are stored
+#
+# Digits are masked before shingling, so "Platform 4" and "Platform 7" look
+# identical to the index and only the first of them is stored. When a match
+# differs only in its numbers, and the stored translation contains those
+# numbers verbatim, they are swapped for the new ones, which makes the match
+# safe to reuse.
+
+from array import array
+from collections import deque
+import json
+import math
+import os
+import random
+import re
+import threading
+
+TM_MODE = os.getenv("MT_TM_MODE", "suggest").lower()  # off | suggest | reuse
+TM_SUGGEST_THRESHOLD = float(os.getenv("MT_TM_SUGGEST_THRESHOLD", "0.8"))
+TM_REUSE_THRESHOLD = float(os.getenv("MT_TM_REUSE_THRESHOLD", "0.95"))
+TM_PATH = os.getenv("MT_TM_PATH", "")  # Optional JSONL file the memory is loaded from and appended to.
+
+NUM_HASHES = 32
+BANDS = 8
+ROWS = NUM_HASHES // BANDS
+SHINGLE_SIZE = 3
+MAX_CANDIDATES = 32
+MAX_BUCKET_SIZE = 64  # Newest segments per LSH bucket; older ones stay reachable through their other bands.
+PRIME = 4294967291  # Largest prime below 2**32, keeps signatures in array('I').
+BIN_RANGE = (PRIME + NUM_HASHES - 1) // NUM_HASHES
+
+# Fixed seed so lookups are reproducible within a run.
+_rng = random.Random(0x7A11)
+HASH_A, HASH_B = _rng.randrange(1, PRIME), _rng.randrange(0, PRIME)
+
+NUMBER_RE = re.compile(r"\d+")
+SPACE_RE = re.compile(r"\s+")
+
+
+def normalize(text: str) -> str:
+    return SPACE_RE.sub(" ", text.strip().lower())
+
+
+def _shingle_hashes(masked: str) -> set[int]:
+    padded = f" {masked} "
+    grams = {padded[i:i + SHINGLE_SIZE] for i in range(max(len(padded) - SHINGLE_SIZE + 1, 1))}
+    # Built-in str hashing is per-process salted, which is fine: signatures are
+    # never persisted, only the segments (MT_TM_PATH) are, and they are re-hashed on load.
+    return {hash(g) & 0xFFFFFFFF for g in grams}
+
+
+def minhash(masked: str) -> array:
+    bins = [None] * NUM_HASHES
+    for h in _shingle_hashes(masked):
+        value, slot = divmod((HASH_A * h + HASH_B) % PRIME, NUM_HASHES)
+        if bins[slot] is None or value < bins[slot]:
+            bins[slot] = value
+    # Short texts leave bins empty. Each empty bin borrows the next filled one
+    # (rotation densification), offset by the distance so it stays distinct.
+    signature = array("I", bytes(4 * NUM_HASHES))
+    for slot in range(NUM_HASHES):
+        for distance in range(NUM_HASHES):
+            value = bins[(slot + distance) % NUM_HASHES]
+            if value is not None:
+                signature[slot] = value + distance * BIN_RANGE
+                break
+    return signature
+
+
+def _band_keys(signature: array):
+    for band in range(BANDS):
+        yield band, tuple(signature[band * ROWS:(band + 1) * ROWS])
+
+
+def _substitute_numbers(source: str, stored_source: str, stored_translation: str) -> str | None:
+    """
+    Carries the numbers of `source` over into a stored translation. Returns None
+    when that cannot be done safely (different count, or a number is missing from
+    the translation, e.g. because it was transliterated).
+    """
+    new_numbers = NUMBER_RE.findall(source)
+    old_numbers = NUMBER_RE.findall(stored_source)
+    if new_numbers == old_numbers:
+        return stored_translation
+    if len(new_numbers) != len(old_numbers) or NUMBER_RE.findall(stored_translation) != old_numbers:
+        return None
+
+    replacements = iter(new_numbers)
+    return NUMBER_RE.sub(lambda _: next(replacements), stored_translation)
+
+
+def _substitutable(source: str, translation: str) -> bool:
+    return NUMBER_RE.findall(translation) == NUMBER_RE.findall(source)
+
+
+class TranslationMemory:
+    def __init__(self, path: str = ""):
+        self.path = path
+        self._lock = threading.Lock()
+        # Per language pair: exact index (digit-masked text -> segment), segment
+        # storage and LSH buckets.
+        self._exact: dict[tuple, dict[str, int]] = {}
+        self._segments: dict[tuple, list] = {}
+        self._buckets: dict[tuple, dict] = {}
+        if path and os.path.exists(path):
+            self._load(path)
+
+    def _load(self, path: str):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    self._index(entry["pair"], entry["source"], entry["translation"])
+
+    def _index(self, pair: str, source: str, translation: str):
+        """Indexes one segment. Returns False when its digit-masked form is already stored."""
+        key = tuple(pair.split("->"))
+        masked = NUMBER_RE.sub("#", normalize(source))
+        exact = self._exact.setdefault(key, {})
+        segments = self._segments.setdefault(key, [])
+        seg_id = exact.get(masked)
+        if seg_id is not None:
+            # Keep one representative per masked form, preferring one whose
+            # numbers can be substituted (they appear verbatim in the translation).
+            stored_source, stored_translation, signature = segments[seg_id]
+            if _substitutable(stored_source, stored_translation) or not _substitutable(source, translation):
+                return False
+            segments[seg_id] = (source, translation, signature)
+            return True
+
+        signature = minhash(masked)
+        seg_id = len(segments)
+        segments.append((source, translation, signature))
+        exact[masked] = seg_id
+        buckets = self._buckets.setdefault(key, {})
+        for band_key in _band_keys(signature):
+            if band_key not in buckets:
+                buckets[band_key] = deque(maxlen=MAX_BUCKET_SIZE)
+            buckets[band_key].append(seg_id)
+        return True
+
+    def add(self, language1: str, language2: str, source: str, translation: str):
+        """Stores a finished translation (and appends it to MT_TM_PATH, if set)."""
+        pair = f"{language1.upper()}->{language2.upper()}"
+        with self._lock:
+            added = self._index(pair, source, translation)
+            if added and self.path:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps({"pair": pair, "source": source, "translation": translation}, ensure_ascii=False) + "\n")
+
+    def _best_candidate(self, key: tuple, signature: array) -> tuple[tuple | None, float]:
+        """The stored segment most similar to `signature`, among those sharing an LSH band. Needs self._lock."""
+        buckets = self._buckets[key]
+        hits: dict[int, int] = {}
+        for band_key in _band_keys(signature):
+            for candidate in buckets.get(band_key, ()):
+                hits[candidate] = hits.get(candidate, 0) + 1
+
+        segments = self._segments[key]
+        best, best_similarity = None, 0.0
+        for candidate in sorted(hits, key=hits.get, reverse=True)[:MAX_CANDIDATES]:
+            stored_signature = segments[candidate][2]
+            similarity = sum(x == y for x, y in zip(signature, stored_signature)) / NUM_HASHES
+            if similarity > best_similarity:
+                best, best_similarity = segments[candidate], similarity
+        return best, best_similarity
+
+    def lookup(self, language1: str, language2: str, text: str, threshold: float) -> dict | None:
+        """
+        Returns the best stored match with similarity >= threshold, as
+        {"source", "translation", "similarity", "reusable"}, or None. `translation`
+        already carries the numbers of `text` when `reusable` is true.
+        """
+        key = (language1.upper(), language2.upper())
+        masked = NUMBER_RE.sub("#", normalize(text))
+        # add() runs on other MT threads, so the index is only read under the lock
+        with self._lock:
+            segments = self._segments.get(key)
+            if not segments:
+                return None
+            seg_id = self._exact.get(key, {}).get(masked)
+            entry = segments[seg_id] if seg_id is not None else None
+
+        best_similarity = 1.0
+        if entry is None:
+            # Hashing is the expensive part and needs no lock
+            signature = minhash(masked)
+            with self._lock:
+                entry, best_similarity = self._best_candidate(key, signature)
+            if entry is None or best_similarity < threshold:
+                return None
+
+        source, translation, _ = entry
+        adapted = _substitute_numbers(text, source, translation)
+        return {
+            "source": source,
+            "translation": adapted if adapted is not None else translation,
+            # Rounded down, so the reported value never clears a threshold the match did not
+            "similarity": math.floor(best_similarity * 1000) / 1000,
+            "reusable": adapted is not None,
+        }
+
+
+memory = TranslationMemory(TM_PATH)
@@ -0,0 +1,147 @@
+# backend/ocr_service/image_preprocess.py
+#
+# Image preprocessing before the OCR upload. Phone photos and screenshots are
+# often far larger than the OCR model needs: 12 MP photos, 3x-density
+# screenshots, full colour. Downscaling to a sane resolution, converting to
+# grayscale and re-encoding compactly cuts upload bytes and upstream latency
+# without hurting recognition (text stays well above the ~20 px x-height OCR
+# models are trained on).
+#
+# Pillow is optional: without it we still detect the real format so the upload
+# carries the correct MIME type, but the image is sent unchanged.
+
+import io
+import os
+import tempfile
+
+from common.event_log import EventLog
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+log = EventLog("ocr")
+
+# Longest side, in pixels, that we send upstream (roughly A4 at 300 DPI).
+MAX_DIMENSION = int(os.getenv("OCR_MAX_DIMENSION", "3508"))
+# Images whose embedded DPI is above this are scaled down to it.
+TARGET_DPI = int(os.getenv("OCR_TARGET_DPI", "300"))
+JPEG_QUALITY = int(os.getenv("OCR_JPEG_QUALITY", "85"))
+PREPROCESS_ENABLED = os.getenv("OCR_PREPROCESS_ENABLED", "true").lower() == "true"
+
+# (magic bytes, offset, format name, MIME type)
+IMAGE_SIGNATURES = [
+    (b"\x89PNG\r\n\x1a\n", 0, "png", "image/png"),
+    (b"\xff\xd8\xff", 0, "jpeg", "image/jpeg"),
+    (b"GIF8", 0, "gif", "image/gif"),
+    (b"BM", 0, "bmp", "image/bmp"),
+    (b"II*\x00", 0, "tiff", "image/tiff"),
+    (b"MM\x00*", 0, "tiff", "image/tiff"),
+    (b"WEBP", 8, "webp", "image/webp"),
+]
+
+
+def detect_image_format(file_path: str) -> tuple[str, str]:
+    """Sniffs the image format from the file header. Returns (format, mime_type)."""
+    with open(file_path, "rb") as f:
+        header = f.read(16)
+
+    for magic, offset, fmt, mime in IMAGE_SIGNATURES:
+        if header[offset:offset + len(magic)] == magic:
+            return fmt, mime
+    return "unknown", "application/octet-stream"
+
+
+def _scale_factor(image) -> float:
+    """How much to shrink the image by: the stricter of the DPI and the resolution limits."""
+    scale = 1.0
+    dpi = image.info.get("dpi")
+    if dpi and dpi[0] and float(dpi[0]) > TARGET_DPI:
+        scale = min(scale, TARGET_DPI / float(dpi[0]))
+    longest = max(image.size)
+    if longest * scale > MAX_DIMENSION:
+        scale = MAX_DIMENSION / longest
+    return scale
+
+
+def _encode(image, fmt: str) -> bytes:
+    buffer = io.BytesIO()
+    if fmt == "jpeg":
+        image.save(buffer, format="JPEG", quality=JPEG_QUALITY, optimize=True)
+    else:
+        image.save(buffer, format="PNG", optimize=True)
+    return buffer.getvalue()
+
+
+def _flatten_alpha(image):
+    """
+    Composites transparent images onto white. convert("L") just drops alpha, so
+    transparent regions of a logo or screenshot would come out with whatever
+    colour their hidden pixels have (often black, hiding dark text).
+    """
+    if image.mode == "P" and "transparency" in image.info:
+        image = image.convert("RGBA")
+    if image.mode in ("RGBA", "LA", "PA"):
+        image = image.convert("RGBA")
+        background = Image.new("RGBA", image.size, (255, 255, 255, 255))
+        image = Image.alpha_composite(background, image).convert("RGB")
+    return image
+
+
+def preprocess_image(file_path: str, job_id: str | None = None, trace_id: str | None = None) -> dict:
+    """
+    Shrinks an uploaded image into a compact grayscale version for OCR.
+
+    Returns {"path", "mime_type", "original_bytes", "upload_bytes", "temporary"}.
+    When Pillow is missing, preprocessing is disabled, or the re-encoded image
+    would not be smaller, the original file is returned with its real MIME type.
+    """
+    fmt, mime_type = detect_image_format(file_path)
+    original_bytes = os.path.getsize(file_path)
+    passthrough = {
+        "path": file_path,
+        "mime_type": mime_type if fmt != "unknown" else "image/jpeg",
+        "original_bytes": original_bytes,
+        "upload_bytes": original_bytes,
+        "temporary": False,
+    }
+
+    if not PREPROCESS_ENABLED or Image is None:
+        return passthrough
+
+    try:
+        with Image.open(file_path) as image:
+            # Honour the camera orientation tag before we drop the metadata.
+            image = ImageOps.exif_transpose(image)
+            scale = _scale_factor(image)
+            if scale < 1.0:
+                new_size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+                image = image.resize(new_size, Image.LANCZOS)
+            image = _flatten_alpha(image).convert("L")
+
+            # Photos compress best as JPEG; screenshots and scans (flat colours,
+            # sharp glyph edges) as PNG. Keep whichever is smaller.
+            candidates = [("png", _encode(image, "png"))]
+            if fmt == "jpeg" or fmt == "webp":
+                candidates.append(("jpeg", _encode(image, "jpeg")))
+            out_fmt, data = min(candidates, key=lambda c: len(c[1]))
+    except Exception as e:
+        log.warning("preprocess.failed", job_id, trace_id, error=str(e))
+        return passthrough
+
+    if len(data) >= original_bytes:
+        return passthrough
+
+    fd, out_path = tempfile.mkstemp(suffix=f".{'jpg' if out_fmt == 'jpeg' else 'png'}", prefix="ocr_")
+    with os.fdopen(fd, "wb") as out:
+        out.write(data)
+
+    log.emit("preprocess.done", job_id, trace_id, format=fmt, output_format=out_fmt, original_bytes=original_bytes, upload_bytes=len(data))
+    return {
+        "path": out_path,
+        "mime_type": "image/jpeg" if out_fmt == "jpeg" else "image/png",
+        "original_bytes": original_bytes,
+        "upload_bytes": len(data),
+        "temporary": True,
+    }
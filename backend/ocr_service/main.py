@@ -3,10 +3,19 @@ from pydantic import BaseModel
 import uuid
 import os
 import requests
+import time
+from common.job_state import create_job_store
+from common.deadlines import http_timeout
+from common.event_log import EventLog
+from common.profiling import install_profiling
+from .image_preprocess import preprocess_image
 
 app = FastAPI()
+install_profiling(app)
 
-jobs = {}
+log = EventLog("ocr")
+
+jobs = create_job_store("ocr")
 
 class Job(BaseModel):
     jobId: str
@@ -16,27 +25,36 @@ class Job(BaseModel):
 class OcrRequest(BaseModel):
     image_file_path: str
     language: str
+    # Absolute epoch time passed down by the orchestrator; the job gives up once it has passed
+    deadline: float | None = None
+    # The v2 job this belongs to, carried on every log record
+    trace_id: str | None = None
 
-def process_ocr_task(job_id: str, file_path: str, language: str):
+def process_ocr_task(job_id: str, file_path: str, language: str, deadline: float | None = None, trace_id: str | None = None):
     ocr_api_url = os.getenv(f"OCR_{language}_API_URL")
     ocr_access_token = os.getenv(f"OCR_{language}_ACCESS_TOKEN")
 
     if not ocr_api_url or not ocr_access_token:
-        jobs[job_id]["status"] = "failed"
-        jobs[job_id]["result"] = {"error": "Server configuration error: Missing OCR API credentials"}
+        jobs[job_id].update(status="failed", result={"error": "Server configuration error: Missing OCR API credentials", "kind": "config"})
         return
 
-    print(f"BACKGROUND TASK: Started OCR processing for job: {job_id}")
+    log.emit("job.started", job_id, trace_id, language=language)
+    started = time.perf_counter()
 
     headers = {"access-token": ocr_access_token}
 
+    upload = None
     try:
+        # Downscale, grayscale and re-encode the image before uploading
+        upload = preprocess_image(file_path, job_id, trace_id)
+        upload_name = os.path.splitext(os.path.basename(file_path))[0] + os.path.splitext(upload["path"])[1] if upload["temporary"] else os.path.basename(file_path)
+
         # The API expects the image file as form-data with the key "file" 
-        with open(file_path, "rb") as image_file:
+        with open(upload["path"], "rb") as image_file:
             files = {
-                "file": (os.path.basename(file_path), image_file, "image/jpeg")
+                "file": (upload_name, image_file, upload["mime_type"])
             }
-            response = requests.post(ocr_api_url, headers=headers, files=files, verify=False)
+            response = requests.post(ocr_api_url, headers=headers, files=files, verify=False, timeout=http_timeout(deadline))
             response.raise_for_status()
 
         api_response_data = response.json()
@@ -44,19 +62,22 @@ def process_ocr_task(job_id: str, file_path: str, language: str):
         if api_response_data.get("status") == "success":
             # The response key is "decoded_text" according to the docs [cite: 67]
             decoded_text = api_response_data["data"]["decoded_text"]
-            jobs[job_id]["status"] = "completed"
-            jobs[job_id]["result"] = {"text": decoded_text}
+            jobs[job_id].update(status="completed", result={
+                "text": decoded_text,
+                "bytes_saved": upload["original_bytes"] - upload["upload_bytes"],
+            })
         else:
             error_message = api_response_data.get("message", "Unknown OCR API error")
-            jobs[job_id]["status"] = "failed"
-            jobs[job_id]["result"] = {"error": error_message}
+            jobs[job_id].update(status="failed", result={"error": error_message})
             
     except Exception as e:
-        print(f"BACKGROUND TASK ERROR: {e}")
-        jobs[job_id]["status"] = "failed"
-        jobs[job_id]["result"] = {"error": str(e)}
+        log.error("job.error", job_id, trace_id, error=str(e))
+        jobs[job_id].update(status="failed", result={"error": str(e)})
+    finally:
+        if upload and upload["temporary"] and os.path.exists(upload["path"]):
+            os.remove(upload["path"])
 
-    print(f"BACKGROUND TASK: Finished OCR processing for job: {job_id}")
+    log.emit("job.finished", job_id, trace_id, status=jobs[job_id]["status"], duration_ms=round((time.perf_counter() - started) * 1000, 1))
 
 @app.post("/api/v1/ocr/jobs", response_model=Job, status_code=202)
 async def start_ocr_job(request: OcrRequest, background_tasks: BackgroundTasks):
@@ -65,11 +86,10 @@ async def start_ocr_job(request: OcrRequest, background_tasks: BackgroundTasks):
     jobs[job_id] = {"status": "processing", "result": None}
     
     if not os.path.exists(request.image_file_path):
-        jobs[job_id]["status"] = "failed"
-        jobs[job_id]["result"] = {"error": "File not found"}
+        jobs[job_id].update(status="failed", result={"error": "File not found", "kind": "validation"})
         raise HTTPException(status_code=400, detail=f"File not found at path: {request.image_file_path}")
     
-    background_tasks.add_task(process_ocr_task, job_id, request.image_file_path, language)
+    background_tasks.add_task(process_ocr_task, job_id, request.image_file_path, language, request.deadline, request.trace_id)
     
     return {"jobId": job_id, "status": "processing", "result": None}
 
@@ -0,0 +1,9 @@
+# backend/tests/conftest.py
+#
+# The services are namespace packages run from backend/ (no __init__.py files),
+# so make backend/ importable however pytest is started.
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,141 @@
+# backend/tests/test_segmentation.py
+
+import random
+import threading
+
+import pytest
+
+from mt_service import segmentation
+from mt_service.segmentation import split_text, join_segments, translate_segments, _hard_split
+
+
+def round_trip(text: str, max_chars: int) -> tuple[list[str], str]:
+    segments, layout = split_text(text, max_chars)
+    return segments, join_segments(segments, layout)
+
+
+def test_short_text_is_one_segment():
+    segments, layout = split_text("Hello world.", 100)
+    assert segments == ["Hello world."]
+    assert join_segments(segments, layout) == "Hello world."
+
+
+def test_surrounding_whitespace_is_kept_out_of_segments():
+    text = "  \n Hello world. \n\n"
+    segments, rebuilt = round_trip(text, 100)
+    assert segments == ["Hello world."]
+    assert rebuilt == text
+
+
+def test_paragraphs_are_never_merged():
+    text = "First one.\n\nSecond one.\n  \n\tThird one."
+    segments, rebuilt = round_trip(text, 1000)
+    assert segments == ["First one.", "Second one.", "Third one."]
+    assert rebuilt == text
+
+
+def test_sentences_are_packed_up_to_the_limit():
+    text = "Aaa aaa. Bbb bbb. Ccc ccc! Ddd ddd?"
+    segments, rebuilt = round_trip(text, 18)
+    assert segments == ["Aaa aaa. Bbb bbb.", "Ccc ccc! Ddd ddd?"]
+    assert rebuilt == text
+
+
+def test_devanagari_danda_ends_a_sentence():
+    text = "यह पहला वाक्य है। यह दूसरा वाक्य है।"
+    segments, rebuilt = round_trip(text, 20)
+    assert segments == ["यह पहला वाक्य है।", "यह दूसरा वाक्य है।"]
+    assert rebuilt == text
+
+
+def test_hard_split_cuts_at_spaces():
+    chunks = _hard_split("aaaa bbbb cccc dddd", 10)
+    assert "".join(chunks) == "aaaa bbbb cccc dddd"
+    assert all(len(c) <= 10 for c in chunks)
+    assert chunks[0] == "aaaa bbbb"
+
+
+def test_hard_split_without_spaces_cuts_at_the_limit():
+    assert _hard_split("x" * 25, 10) == ["x" * 10, "x" * 10, "x" * 5]
+
+
+def test_long_sentence_is_hard_split():
+    text = " ".join(["word"] * 60) + "."
+    segments, rebuilt = round_trip(text, 50)
+    assert len(segments) > 1
+    assert all(len(s) <= 50 for s in segments)
+    assert rebuilt == text
+
+
+def test_translations_are_placed_by_layout():
+    text = "One. Two.\n\nThree."
+    segments, layout = split_text(text, 5)
+    translated = join_segments([s.upper() for s in segments], layout)
+    assert translated == "ONE. TWO.\n\nTHREE."
+
+
+def test_random_texts_round_trip_within_limit():
+    rng = random.Random(7)
+    pieces = ["word", "longerword", ".", "!", "?", "।", " ", "  ", "\n", "\n\n", "\n \n", "\t"]
+    for _ in range(300):
+        text = "".join(rng.choice(pieces) for _ in range(rng.randint(0, 80)))
+        max_chars = rng.randint(1, 40)
+        segments, rebuilt = round_trip(text, max_chars)
+        assert rebuilt == text
+        assert all(s and s == s.strip() and len(s) <= max_chars for s in segments)
+
+
+class FlakyUpstream:
+    """Stands in for call_mt_api: upper-cases text, failing given segments a number of times."""
+
+    def __init__(self, failures: dict[str, int]):
+        self.failures = dict(failures)
+        self.sent = []
+        self.lock = threading.Lock()
+
+    def __call__(self, text: str) -> str:
+        with self.lock:
+            self.sent.append(text)
+            if self.failures.get(text, 0) > 0:
+                self.failures[text] -= 1
+                raise Exception(f"upstream error for {text}")
+        return text.upper()
+
+
+@pytest.fixture(autouse=True)
+def no_retry_sleep(monkeypatch):
+    monkeypatch.setattr(segmentation.time, "sleep", lambda seconds: None)
+
+
+def test_only_failed_segments_are_retried():
+    text = "One here. Two here.\n\nThree here. Four here.\n\nFive here."
+    segments, layout = split_text(text, 12)
+    upstream = FlakyUpstream({"Two here.": 1, "Four here.": 2})
+
+    translations = translate_segments("job", None, segments, upstream)
+
+    assert sorted(upstream.sent) == sorted(segments + ["Two here.", "Four here.", "Four here."])
+    assert join_segments(translations, layout) == text.upper()
+
+
+def test_known_segments_are_not_sent():
+    segments = ["One.", "Two.", "Three."]
+    upstream = FlakyUpstream({"Three.": 1})
+    translated = []
+
+    translations = translate_segments("job", None, segments, upstream, known={1: "deux"},
+                                      on_translated=lambda i, t: translated.append(i))
+
+    assert translations == ["ONE.", "deux", "THREE."]
+    assert sorted(upstream.sent) == ["One.", "Three.", "Three."]
+    assert sorted(translated) == [0, 2]
+
+
+def test_segment_failing_every_attempt_fails_the_text():
+    segments = ["One.", "Two."]
+    upstream = FlakyUpstream({"Two.": segmentation.SEGMENT_RETRIES + 1})
+
+    with pytest.raises(Exception, match="1 of 2 segments failed"):
+        translate_segments("job", None, segments, upstream)
+    assert upstream.sent.count("One.") == 1
+    assert upstream.sent.count("Two.") == segmentation.SEGMENT_RETRIES + 1
@@ -0,0 +1,176 @@
+# backend/tests/test_translation_memory.py
+
+import json
+import random
+import sys
+import threading
+import zlib
+
+import pytest
+
+from mt_service import translation_memory
+from mt_service.translation_memory import TranslationMemory, MAX_BUCKET_SIZE, _substitute_numbers, minhash
+
+SOURCE = "Platform 4 is closed for maintenance today"
+TRANSLATION = "प्लेटफ़ॉर्म 4 आज रखरखाव के लिए बंद है"
+
+
+@pytest.fixture(autouse=True)
+def stable_hashing(monkeypatch):
+    # Built-in str hashing is salted per process; fixed shingle hashes make the MinHash estimates reproducible
+    monkeypatch.setattr(translation_memory, "hash", lambda gram: zlib.crc32(gram.encode()), raising=False)
+
+
+def make_memory(*entries) -> TranslationMemory:
+    memory = TranslationMemory()
+    for source, translation in entries:
+        memory.add("english", "hindi", source, translation)
+    return memory
+
+
+# --- _substitute_numbers ---
+
+def test_same_numbers_keep_the_translation():
+    assert _substitute_numbers("Gate 7", "Gate 7", "गेट 7") == "गेट 7"
+
+
+def test_numbers_are_carried_over_in_order():
+    assert _substitute_numbers("Train 12 at 9", "Train 45 at 6", "ट्रेन 45, 6 बजे") == "ट्रेन 12, 9 बजे"
+
+
+def test_different_number_count_is_not_substituted():
+    assert _substitute_numbers("Gate 7 and 8", "Gate 3", "गेट 3") is None
+
+
+def test_number_missing_from_translation_is_not_substituted():
+    assert _substitute_numbers("Gate 7", "Gate 3", "गेट तीन") is None
+
+
+def test_reordered_numbers_in_translation_are_not_substituted():
+    assert _substitute_numbers("From 1 to 2", "From 3 to 4", "4 से 3 तक") is None
+
+
+# --- lookup ---
+
+def test_empty_memory_has_no_match():
+    assert make_memory().lookup("english", "hindi", SOURCE, 0.5) is None
+
+
+def test_exact_match_ignores_case_and_spacing():
+    match = make_memory((SOURCE, TRANSLATION)).lookup("ENGLISH", "HINDI", "  platform 4 IS closed  for maintenance today", 0.99)
+    assert match == {"source": SOURCE, "translation": TRANSLATION, "similarity": 1.0, "reusable": True}
+
+
+def test_match_with_other_numbers_carries_them_over():
+    match = make_memory((SOURCE, TRANSLATION)).lookup("english", "hindi", "Platform 11 is closed for maintenance today", 0.99)
+    assert match["similarity"] == 1.0
+    assert match["reusable"]
+    assert match["translation"] == "प्लेटफ़ॉर्म 11 आज रखरखाव के लिए बंद है"
+
+
+NEAR_DUPLICATE = "Platform 4 is closed for maintenance tonight"
+
+
+def test_near_duplicate_is_found_above_threshold():
+    memory = make_memory((SOURCE, TRANSLATION))
+    match = memory.lookup("english", "hindi", NEAR_DUPLICATE, 0.6)
+    assert match is not None
+    assert 0.6 <= match["similarity"] < 1.0
+    assert match["source"] == SOURCE
+
+
+def test_threshold_rejects_weaker_matches():
+    memory = make_memory((SOURCE, TRANSLATION))
+    text = NEAR_DUPLICATE
+    similarity = memory.lookup("english", "hindi", text, 0.0)["similarity"]
+    assert memory.lookup("english", "hindi", text, similarity) is not None
+    assert memory.lookup("english", "hindi", text, min(1.0, similarity + 0.01)) is None
+
+
+def test_unrelated_text_has_no_match():
+    memory = make_memory((SOURCE, TRANSLATION))
+    assert memory.lookup("english", "hindi", "Tickets are sold at the counter", 0.5) is None
+
+
+def test_language_pairs_are_separate():
+    memory = make_memory((SOURCE, TRANSLATION))
+    assert memory.lookup("english", "kannada", SOURCE, 0.5) is None
+    assert memory.lookup("hindi", "english", SOURCE, 0.5) is None
+
+
+def test_untransferable_numbers_are_suggested_but_not_reusable():
+    memory = make_memory(("Gate 3 is open", "गेट तीन खुला है"))
+    match = memory.lookup("english", "hindi", "Gate 5 is open", 0.9)
+    assert match["translation"] == "गेट तीन खुला है"
+    assert not match["reusable"]
+
+
+# --- Indexing ---
+
+def test_numbered_variants_are_stored_once():
+    memory = make_memory(*((f"Platform {i} is closed", f"प्लेटफ़ॉर्म {i} बंद है") for i in range(200)))
+    assert len(memory._segments[("ENGLISH", "HINDI")]) == 1
+    match = memory.lookup("english", "hindi", "Platform 150 is closed", 0.99)
+    assert match["translation"] == "प्लेटफ़ॉर्म 150 बंद है"
+
+
+def test_substitutable_representative_replaces_one_that_is_not():
+    memory = make_memory(("Gate 3 is open", "गेट तीन खुला है"), ("Gate 4 is open", "गेट 4 खुला है"))
+    match = memory.lookup("english", "hindi", "Gate 9 is open", 0.99)
+    assert match["translation"] == "गेट 9 खुला है"
+    assert match["reusable"]
+
+
+def test_buckets_are_capped():
+    memory = make_memory(*((f"notice {'x' * i}", f"सूचना {i}") for i in range(MAX_BUCKET_SIZE * 3)))
+    assert all(len(bucket) <= MAX_BUCKET_SIZE for bucket in memory._buckets[("ENGLISH", "HINDI")].values())
+
+
+def test_signature_is_stable_and_sized():
+    assert minhash("platform # is closed") == minhash("platform # is closed")
+    assert len(minhash("")) == len(minhash("a much longer text " * 50))
+
+
+def test_memory_is_persisted_and_reloaded(tmp_path):
+    path = str(tmp_path / "tm.jsonl")
+    memory = TranslationMemory(path)
+    memory.add("english", "hindi", SOURCE, TRANSLATION)
+    memory.add("english", "hindi", "Platform 9 is closed for maintenance today", "प्लेटफ़ॉर्म 9 आज रखरखाव के लिए बंद है")
+
+    with open(path, encoding="utf-8") as f:
+        lines = [json.loads(line) for line in f]
+    assert lines == [{"pair": "ENGLISH->HINDI", "source": SOURCE, "translation": TRANSLATION}]
+
+    reloaded = TranslationMemory(path)
+    assert reloaded.lookup("english", "hindi", SOURCE, 0.99)["translation"] == TRANSLATION
+
+
+def test_lookup_is_safe_while_other_threads_add():
+    memory = TranslationMemory()
+    errors = []
+
+    def add(seed):
+        rng = random.Random(seed)
+        for _ in range(800):
+            memory.add("english", "hindi", "notice " + "".join(rng.choice("abcdefgh") for _ in range(30)), "x")
+
+    def lookup(seed):
+        rng = random.Random(seed)
+        try:
+            for _ in range(800):
+                memory.lookup("english", "hindi", "notice " + "".join(rng.choice("abcdefgh") for _ in range(30)), 0.5)
+        except Exception as e:
+            errors.append(e)
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)  # Switch threads often enough to hit a bucket mid-iteration
+    try:
+        threads = [threading.Thread(target=add, args=(i,)) for i in range(2)]
+        threads += [threading.Thread(target=lookup, args=(i,)) for i in range(2)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    finally:
+        sys.setswitchinterval(interval)
+    assert errors == []
@@ -3,10 +3,19 @@ from pydantic import BaseModel
 import uuid
 import os
 import requests
+import time
+from common.job_state import create_job_store
+from common.deadlines import http_timeout
+from common.event_log import EventLog
+from common.profiling import install_profiling
+from common.audio_store import get_audio_store
 
 app = FastAPI()
+install_profiling(app)
 
-jobs = {}
+log = EventLog("tts")
+
+jobs = create_job_store("tts")
 
 class Job(BaseModel):
     jobId: str
@@ -17,17 +26,21 @@ class TtsRequest(BaseModel):
     text_to_speak: str
     gender: str # As per the docs, this should be "male" or "female" 
     language: str
+    # Absolute epoch time passed down by the orchestrator; the job gives up once it has passed
+    deadline: float | None = None
+    # The v2 job this belongs to, carried on every log record
+    trace_id: str | None = None
 
-def process_tts_task(job_id: str, text: str, gender: str, language:str):
+def process_tts_task(job_id: str, text: str, gender: str, language:str, deadline: float | None = None, trace_id: str | None = None):
     tts_api_url = os.getenv(f"TTS_{language}_API_URL")
     tts_access_token = os.getenv(f"TTS_{language}_ACCESS_TOKEN")
 
     if not tts_api_url or not tts_access_token:
-        jobs[job_id]["status"] = "failed"
-        jobs[job_id]["result"] = {"error": "Server configuration error: Missing TTS API credentials"}
+        jobs[job_id].update(status="failed", result={"error": "Server configuration error: Missing TTS API credentials", "kind": "config"})
         return
 
-    print(f"BACKGROUND TASK: Started TTS processing for job: {job_id}")
+    log.emit("job.started", job_id, trace_id, language=language, chars=len(text))
+    started = time.perf_counter()
 
     headers = {"access-token": tts_access_token}
     
@@ -38,7 +51,7 @@ def process_tts_task(job_id: str, text: str, gender: str, language:str):
     }
 
     try:
-        response = requests.post(tts_api_url, headers=headers, json=payload, verify=False)
+        response = requests.post(tts_api_url, headers=headers, json=payload, verify=False, timeout=http_timeout(deadline))
         response.raise_for_status()
 
         api_response_data = response.json()
@@ -46,19 +59,26 @@ def process_tts_task(job_id: str, text: str, gender: str, language:str):
         if api_response_data.get("status") == "success":
             # The response key is "s3_url" inside the "data" object [cite: 88, 87]
             s3_url = api_response_data["data"]["s3_url"]
-            jobs[job_id]["status"] = "completed"
-            jobs[job_id]["result"] = {"audio_url": s3_url}
+            result = {"audio_url": s3_url}
+
+            # Keep a local copy so replays don't go back to the remote object store.
+            # It is optional: past the deadline the job completes with just the s3_url.
+            if (store := get_audio_store()) is not None:
+                try:
+                    result["audio_id"] = store.fetch(s3_url, deadline=deadline)
+                except Exception as store_err:
+                    log.warning("audio_store.failed", job_id, trace_id, error=str(store_err))
+
+            jobs[job_id].update(status="completed", result=result)
         else:
             error_message = api_response_data.get("message", "Unknown TTS API error")
-            jobs[job_id]["status"] = "failed"
-            jobs[job_id]["result"] = {"error": error_message}
+            jobs[job_id].update(status="failed", result={"error": error_message})
             
     except Exception as e:
-        print(f"BACKGROUND TASK ERROR: {e}")
-        jobs[job_id]["status"] = "failed"
-        jobs[job_id]["result"] = {"error": str(e)}
+        log.error("job.error", job_id, trace_id, error=str(e))
+        jobs[job_id].update(status="failed", result={"error": str(e)})
 
-    print(f"BACKGROUND TASK: Finished TTS processing for job: {job_id}")
+    log.emit("job.finished", job_id, trace_id, status=jobs[job_id]["status"], duration_ms=round((time.perf_counter() - started) * 1000, 1))
 
 @app.post("/api/v1/tts/jobs", response_model=Job, status_code=202)
 async def start_tts_job(request: TtsRequest, background_tasks: BackgroundTasks):
@@ -67,7 +87,7 @@ async def start_tts_job(request: TtsRequest, background_tasks: BackgroundTasks):
     job_id = str(uuid.uuid4())
     jobs[job_id] = {"status": "processing", "result": None}
     
-    background_tasks.add_task(process_tts_task, job_id, request.text_to_speak, request.gender, language)
+    background_tasks.add_task(process_tts_task, job_id, request.text_to_speak, request.gender, language, request.deadline, request.trace_id)
     
     return {"jobId": job_id, "status": "processing", "result": None}
 
@@ -0,0 +1,231 @@
+# backend/v2_services/admission.py
+#
+# Admission control for the v2 front door.
+#
+# Without it every request is accepted and queued, so under overload all jobs
+# get slow together and memory keeps growing. Instead, each job-creating
+# endpoint declares its priority class and the v1 services it needs, and is
+# refused up front when:
+#
+#   - its class already has V2_ADMIT_MAX_QUEUED_<CLASS> jobs waiting      -> 429
+#   - V2_ADMIT_MAX_IN_FLIGHT jobs are queued or running over all classes  -> 429
+#   - a v1 service it needs is failing (most of its recent calls errored) -> 503
+#
+# Refusals are cheap and carry Retry-After, so clients back off while accepted
+# jobs keep their latency. Upstream health comes from the orchestrator's own
+# stages (record_upstream): a stage fails when a call to the v1 service fails
+# (connection error, HTTP 5xx) or its v1 job ends "failed". Once
+# V2_ADMIT_UNHEALTHY_RATIO of the last stages of a service, within
+# V2_ADMIT_HEALTH_WINDOW_SECONDS, failed, the service counts as down until those
+# failures age out of the window.
+#
+# Outcomes are kept next to the job state: in memory for a single process, or
+# in the shared SQLite file / Redis server, so that the web process also sees
+# the stages run by the durable-queue workers.
+
+from collections import deque
+from fastapi import HTTPException
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+
+from common.event_log import EventLog
+from common.job_state import JOB_STATE_DB, JOB_STATE_REDIS_URL, redis
+from .scheduler import scheduler, INTERACTIVE, STANDARD, BULK
+from .job_queue import queue_stats, state_backend, QUEUE_MODE
+
+log = EventLog("v2")
+
+MAX_QUEUED = {
+    INTERACTIVE: int(os.getenv("V2_ADMIT_MAX_QUEUED_INTERACTIVE", "8")),
+    STANDARD: int(os.getenv("V2_ADMIT_MAX_QUEUED_STANDARD", "200")),
+    BULK: int(os.getenv("V2_ADMIT_MAX_QUEUED_BULK", "50")),
+}
+MAX_IN_FLIGHT = int(os.getenv("V2_ADMIT_MAX_IN_FLIGHT", "1000"))
+# Base Retry-After per class; scaled up the further the class is over its limit.
+RETRY_AFTER_SECONDS = {
+    INTERACTIVE: int(os.getenv("V2_ADMIT_RETRY_AFTER_INTERACTIVE", "1")),
+    STANDARD: int(os.getenv("V2_ADMIT_RETRY_AFTER_STANDARD", "10")),
+    BULK: int(os.getenv("V2_ADMIT_RETRY_AFTER_BULK", "60")),
+}
+
+HEALTH_WINDOW_SECONDS = float(os.getenv("V2_ADMIT_HEALTH_WINDOW_SECONDS", "30"))
+HEALTH_MIN_CALLS = int(os.getenv("V2_ADMIT_HEALTH_MIN_CALLS", "5"))
+UNHEALTHY_RATIO = float(os.getenv("V2_ADMIT_UNHEALTHY_RATIO", "0.5"))
+HEALTH_MAX_SAMPLES = 50
+
+# The durable queue and shared upstream outcomes are counted in SQLite/Redis;
+# reuse a recent count instead of querying on every request.
+LOAD_CACHE_SECONDS = 0.5
+
+# --- Upstream health ---
+
+class _MemoryOutcomes:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._outcomes: dict[str, deque] = {}
+
+    def record(self, service: str, at: float, ok: bool):
+        with self._lock:
+            self._outcomes.setdefault(service, deque(maxlen=HEALTH_MAX_SAMPLES)).append((at, ok))
+
+    def recent(self, service: str, since: float) -> list[tuple[float, bool]]:
+        with self._lock:
+            return [(t, ok) for t, ok in self._outcomes.get(service, ()) if t >= since]
+
+
+class _SqliteOutcomes:
+    PRUNE_EVERY = 200
+
+    def __init__(self, path: str = JOB_STATE_DB):
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS upstream_outcomes (service TEXT NOT NULL, at REAL NOT NULL, ok INTEGER NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS upstream_outcomes_recent ON upstream_outcomes (service, at)")
+            self._local.conn = conn
+        return conn
+
+    def record(self, service: str, at: float, ok: bool):
+        conn = self._connect()
+        conn.execute("INSERT INTO upstream_outcomes (service, at, ok) VALUES (?, ?, ?)", (service, at, int(ok)))
+        self._writes += 1
+        if self._writes % self.PRUNE_EVERY == 0:
+            conn.execute("DELETE FROM upstream_outcomes WHERE at < ?", (at - HEALTH_WINDOW_SECONDS,))
+
+    def recent(self, service: str, since: float) -> list[tuple[float, bool]]:
+        rows = self._connect().execute(
+            "SELECT at, ok FROM upstream_outcomes WHERE service = ? AND at >= ? ORDER BY at DESC LIMIT ?",
+            (service, since, HEALTH_MAX_SAMPLES),
+        ).fetchall()
+        return [(at, bool(ok)) for at, ok in reversed(rows)]
+
+
+class _RedisOutcomes:
+    def __init__(self, url: str = JOB_STATE_REDIS_URL):
+        if redis is None:
+            raise RuntimeError("JOB_STATE_BACKEND=redis requires the 'redis' package")
+        self.client = redis.Redis.from_url(url)
+
+    def record(self, service: str, at: float, ok: bool):
+        key = f"upstream:{service}"
+        pipe = self.client.pipeline()
+        pipe.lpush(key, json.dumps([at, ok]))
+        pipe.ltrim(key, 0, HEALTH_MAX_SAMPLES - 1)
+        pipe.expire(key, math.ceil(HEALTH_WINDOW_SECONDS))
+        pipe.execute()
+
+    def recent(self, service: str, since: float) -> list[tuple[float, bool]]:
+        entries = [json.loads(raw) for raw in self.client.lrange(f"upstream:{service}", 0, -1)]
+        return [(at, ok) for at, ok in reversed(entries) if at >= since]
+
+
+def _create_outcomes():
+    backend = state_backend()
+    if backend == "sqlite":
+        return _SqliteOutcomes()
+    if backend == "redis":
+        return _RedisOutcomes()
+    return _MemoryOutcomes()
+
+
+_outcomes = _create_outcomes()
+_health_cache: dict[str, tuple[float, dict]] = {}
+
+
+def record_upstream(service: str, ok: bool):
+    """Records the outcome of one stage run on a v1 service."""
+    try:
+        _outcomes.record(service, time.time(), ok)
+    except Exception as e:
+        # Health tracking must never fail the stage itself
+        log.warning("admission.record_failed", upstream=service, error=str(e))
+
+
+def upstream_health(service: str) -> dict:
+    """{"healthy", "calls", "failures", "retry_after"} over the health window."""
+    now = time.time()
+    cached = _health_cache.get(service)
+    if cached is not None and not isinstance(_outcomes, _MemoryOutcomes) and now - cached[0] < LOAD_CACHE_SECONDS:
+        return cached[1]
+
+    recent = _outcomes.recent(service, now - HEALTH_WINDOW_SECONDS)
+    failures = [t for t, ok in recent if not ok]
+    healthy = len(recent) < HEALTH_MIN_CALLS or len(failures) / len(recent) < UNHEALTHY_RATIO
+    retry_after = 0
+    if not healthy:
+        # By the time the oldest failure ages out, the ratio has started to drop
+        retry_after = max(1, math.ceil(HEALTH_WINDOW_SECONDS - (now - failures[0])))
+    health = {"healthy": healthy, "calls": len(recent), "failures": len(failures), "retry_after": retry_after}
+    _health_cache[service] = (now, health)
+    return health
+
+# --- Load ---
+
+_load_cache = {"at": 0.0, "stats": None}
+
+
+def current_load() -> dict:
+    """Queued/running jobs per priority class, from the scheduler and (if durable) the job queue."""
+    now = time.monotonic()
+    if _load_cache["stats"] is not None and now - _load_cache["at"] < LOAD_CACHE_SECONDS:
+        return _load_cache["stats"]
+
+    stats = {name: {"queued": s["queued"], "running": s["running"]} for name, s in scheduler.stats().items()}
+    if QUEUE_MODE == "durable":
+        # Standard and bulk jobs run on the worker pool; interactive ones stay in-process
+        for name, s in queue_stats().items():
+            if name != INTERACTIVE:
+                stats[name] = {"queued": s["queued"], "running": s["running"]}
+
+    _load_cache.update(at=now, stats=stats)
+    return stats
+
+
+def _reject(status_code: int, retry_after: int, detail: str, priority: str):
+    log.warning("admission.rejected", status_code=status_code, priority=priority, detail=detail, retry_after=retry_after)
+    raise HTTPException(status_code=status_code, detail=detail, headers={"Retry-After": str(retry_after)})
+
+
+def admit(priority: str, *services: str):
+    """
+    FastAPI dependency for a job-creating endpoint of the given priority class,
+    which needs the given v1 services. Raises 429/503 with Retry-After to shed load.
+    """
+    def check_admission():
+        load = current_load()
+        queued = load[priority]["queued"]
+        if queued >= MAX_QUEUED[priority]:
+            overload = queued / max(1, MAX_QUEUED[priority])
+            _reject(429, math.ceil(RETRY_AFTER_SECONDS[priority] * overload), f"Too many queued {priority} jobs, try again later", priority)
+
+        in_flight = sum(s["queued"] + s["running"] for s in load.values())
+        if in_flight >= MAX_IN_FLIGHT:
+            _reject(429, RETRY_AFTER_SECONDS[priority], "Too many jobs in flight, try again later", priority)
+
+        for service in services:
+            health = upstream_health(service)
+            if not health["healthy"]:
+                _reject(503, health["retry_after"], f"{service} service is unavailable, try again later", priority)
+
+        # Count this job right away, so a burst cannot slip in before the next refresh
+        load[priority]["queued"] += 1
+
+    return check_admission
+
+
+def admission_stats() -> dict:
+    return {
+        "limits": {"max_queued": MAX_QUEUED, "max_in_flight": MAX_IN_FLIGHT},
+        "upstream": {service: upstream_health(service) for service in ("ASR", "MT", "OCR", "TTS")},
+    }
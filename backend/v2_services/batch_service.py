@@ -0,0 +1,332 @@
+# backend/v2_services/batch_service.py
+#
+# Bulk document translation (OCR -> MT) for digitization runs.
+#
+# A batch is created from a list of image paths or an uploaded archive (zip /
+# tar), then processed in the bulk priority class with bounded parallelism.
+# Every finished document is appended as one JSON line to the batch's NDJSON
+# file, which doubles as the progress record:
+#
+#   - GET .../results streams those lines while the batch is still running
+#     (pass ?offset=N to resume a dropped stream after N lines)
+#   - POST .../resume (or a worker restart on the durable queue) re-runs the
+#     batch and skips every document that already has a line; a resume first
+#     drops the lines of failed documents, so each document has one line
+
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Depends
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import json
+import os
+import shutil
+import tarfile
+import threading
+import uuid
+import zipfile
+
+from common.deadlines import DeadlineExceeded
+from .main import jobs, log, run_stage, complete_job, fail_job, new_job_state, JobCancelled, UPLOAD_DIR
+from .scheduler import BULK
+from .job_queue import enqueue, register_task
+from .admission import admit
+
+router = APIRouter(tags=["Framework 7: Bulk Document Translation"])
+
+BATCH_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "batches")
+os.makedirs(BATCH_DIR, exist_ok=True)
+
+BATCH_MAX_PARALLEL = int(os.getenv("V2_BATCH_MAX_PARALLEL", "4"))
+BATCH_MAX_FILES = int(os.getenv("V2_BATCH_MAX_FILES", "10000"))
+# Limits on uploaded archives, checked while extracting
+BATCH_MAX_ARCHIVE_BYTES = int(float(os.getenv("V2_BATCH_MAX_ARCHIVE_MB", "2048")) * 1024 * 1024)
+BATCH_MAX_FILE_BYTES = int(float(os.getenv("V2_BATCH_MAX_FILE_MB", "50")) * 1024 * 1024)
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".tif", ".tiff", ".bmp", ".webp", ".gif"}
+
+TERMINAL_STATUSES = {"completed", "partially_completed", "failed", "cancelled"}
+
+# ---------------------
+# MODELS
+# ---------------------
+
+class DocumentBatchRequest(BaseModel):
+    image_file_paths: list[str]
+    input_language: str
+    output_language: str
+    deadline_seconds: float | None = Field(None, gt=0)
+
+class BatchJob(BaseModel):
+    jobId: str
+    status: str
+    total: int = 0
+    done: int = 0
+    failed: int = 0
+    result: str | None = None
+
+# ---------------------
+# BATCH FILES (manifest + NDJSON results)
+# ---------------------
+
+def _manifest_path(batch_id: str) -> str:
+    return os.path.join(BATCH_DIR, f"{batch_id}.json")
+
+
+def _results_path(batch_id: str) -> str:
+    return os.path.join(BATCH_DIR, f"{batch_id}.ndjson")
+
+
+def _drop_failed_records(batch_id: str) -> set[int]:
+    """
+    Rewrites the results file with only its completed lines, so re-running the
+    failed documents does not add a second line for them. Returns the indexes
+    of the completed documents.
+    """
+    results_path = _results_path(batch_id)
+    if not os.path.exists(results_path):
+        return set()
+    finished, kept = set(), []
+    with open(results_path, encoding="utf-8") as f:
+        for line in f:
+            if line.endswith("\n") and (record := json.loads(line))["status"] == "completed" and record["index"] not in finished:
+                finished.add(record["index"])
+                kept.append(line)
+    tmp_path = results_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.writelines(kept)
+    os.replace(tmp_path, results_path)
+    return finished
+
+
+def _extract_archive(archive_path: str, target_dir: str) -> list[str]:
+    """
+    Extracts the image files of a zip/tar archive into target_dir (flattened, no
+    path traversal). The file count and sizes are checked before each file is
+    written, so an oversized archive is rejected without unpacking it.
+    """
+    extracted = []
+    total_bytes = 0
+
+    def keep(name: str) -> bool:
+        return os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS and not os.path.basename(name).startswith(".")
+
+    def out_path(name: str, size: int) -> str:
+        nonlocal total_bytes
+        if len(extracted) >= BATCH_MAX_FILES:
+            raise HTTPException(status_code=400, detail=f"A batch may contain at most {BATCH_MAX_FILES} files")
+        if size > BATCH_MAX_FILE_BYTES:
+            raise HTTPException(status_code=400, detail=f"{os.path.basename(name)} is larger than {BATCH_MAX_FILE_BYTES // (1024 * 1024)} MB")
+        total_bytes += size
+        if total_bytes > BATCH_MAX_ARCHIVE_BYTES:
+            raise HTTPException(status_code=400, detail=f"The archive unpacks to more than {BATCH_MAX_ARCHIVE_BYTES // (1024 * 1024)} MB")
+        return os.path.join(target_dir, f"{len(extracted):06d}_{os.path.basename(name)}")
+
+    if zipfile.is_zipfile(archive_path):
+        with zipfile.ZipFile(archive_path) as archive:
+            for info in sorted(archive.infolist(), key=lambda i: i.filename):
+                if info.is_dir() or not keep(info.filename):
+                    continue
+                # The zip reader stops at file_size, so the declared size bounds what is written
+                path = out_path(info.filename, info.file_size)
+                with archive.open(info) as src, open(path, "wb") as dst:
+                    shutil.copyfileobj(src, dst)
+                extracted.append(path)
+    elif tarfile.is_tarfile(archive_path):
+        with tarfile.open(archive_path) as archive:
+            for member in sorted(archive.getmembers(), key=lambda m: m.name):
+                if not member.isfile() or not keep(member.name):
+                    continue
+                path = out_path(member.name, member.size)
+                with archive.extractfile(member) as src, open(path, "wb") as dst:
+                    shutil.copyfileobj(src, dst)
+                extracted.append(path)
+    else:
+        raise HTTPException(status_code=400, detail="Archive must be a zip or tar file")
+
+    return extracted
+
+# ---------------------
+# PIPELINE LOGIC
+# ---------------------
+
+def translate_document(batch_id: str, index: int, file_path: str, input_language: str, output_language: str) -> dict:
+    """OCR -> MT for one document of a batch. Returns its NDJSON record."""
+    record = {"index": index, "file": os.path.basename(file_path)}
+    skipped = []
+    try:
+        ocr_result = run_stage("OCR", {"image_file_path": file_path, "language": input_language}, batch_id, skipped=skipped)
+        mt_result = run_stage("MT", {"text": ocr_result["text"], "language1": input_language, "language2": output_language}, batch_id, skipped=skipped)
+        record.update({"status": "completed", "extracted_text": ocr_result["text"], "translated_text": mt_result["translatedText"]})
+        if skipped:
+            record["skipped_stages"] = skipped
+    except (JobCancelled, DeadlineExceeded):
+        # Stops the whole batch; finished documents stay recorded for a resume
+        raise
+    except Exception as e:
+        record.update({"status": "failed", "error": str(e)})
+    return record
+
+
+@register_task("document-batch")
+def run_document_batch_pipeline(job_id: str):
+    try:
+        with open(_manifest_path(job_id), encoding="utf-8") as f:
+            manifest = json.load(f)
+        files = manifest["files"]
+        # Also covers a re-run after a worker crash, not only an explicit resume
+        finished = _drop_failed_records(job_id)
+        pending = [(i, path) for i, path in enumerate(files) if i not in finished]
+        log.emit("batch.started", job_id, total=len(files), already_done=len(finished), pending=len(pending))
+
+        counts = {"done": len(finished), "failed": 0}
+        write_lock = threading.Lock()
+
+        def process(item):
+            index, path = item
+            record = translate_document(job_id, index, path, manifest["input_language"], manifest["output_language"])
+            with write_lock:
+                # One write per line, so streaming readers never see half a record
+                with open(_results_path(job_id), "a", encoding="utf-8") as out:
+                    out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                counts["done" if record["status"] == "completed" else "failed"] += 1
+                jobs[job_id].update(done=counts["done"], failed=counts["failed"])
+            if record["status"] == "completed" and manifest.get("owns_files"):
+                os.remove(path)
+
+        with ThreadPoolExecutor(max_workers=BATCH_MAX_PARALLEL) as pool:
+            list(pool.map(process, pending))
+
+        status = "completed" if counts["failed"] == 0 else ("partially_completed" if counts["done"] else "failed")
+        complete_job(job_id, None, status)
+        if status == "completed" and manifest.get("owns_files"):
+            shutil.rmtree(os.path.dirname(files[0]), ignore_errors=True)
+    except Exception as e:
+        fail_job(job_id, e)
+
+
+def start_batch(batch_id: str, files: list[str], input_language: str, output_language: str, owns_files: bool, deadline_seconds: float | None) -> dict:
+    if not files:
+        raise HTTPException(status_code=400, detail="The batch contains no image files")
+    if len(files) > BATCH_MAX_FILES:
+        raise HTTPException(status_code=400, detail=f"A batch may contain at most {BATCH_MAX_FILES} files")
+
+    manifest = {
+        "files": files,
+        "input_language": input_language.upper(),
+        "output_language": output_language.upper(),
+        "owns_files": owns_files,
+    }
+    with open(_manifest_path(batch_id), "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+
+    jobs[batch_id] = {**new_job_state(deadline_seconds), "total": len(files), "done": 0, "failed": 0}
+    enqueue(batch_id, "document-batch", BULK)
+    return {"jobId": batch_id, **jobs[batch_id]}
+
+# ---------------------
+# API ROUTES
+# ---------------------
+
+@router.post("/api/v2/document-batch", response_model=BatchJob, status_code=202, dependencies=[Depends(admit(BULK, "OCR", "MT"))])
+async def start_document_batch(request: DocumentBatchRequest):
+    missing = [p for p in request.image_file_paths if not os.path.exists(p)]
+    if missing:
+        raise HTTPException(status_code=400, detail=f"Files not found: {missing[:10]}")
+    batch_id = str(uuid.uuid4())
+    return start_batch(batch_id, request.image_file_paths, request.input_language, request.output_language, False, request.deadline_seconds)
+
+
+@router.post("/api/v2/document-batch/archive", response_model=BatchJob, status_code=202, dependencies=[Depends(admit(BULK, "OCR", "MT"))])
+async def start_document_batch_from_archive(
+    file: UploadFile = File(...),
+    input_language: str = Form(...),
+    output_language: str = Form(...),
+    deadline_seconds: float | None = Form(None, gt=0),
+):
+    batch_id = str(uuid.uuid4())
+    target_dir = os.path.join(UPLOAD_DIR, f"batch_{batch_id}")
+    os.makedirs(target_dir, exist_ok=True)
+    archive_path = os.path.join(target_dir, "archive")
+    try:
+        with open(archive_path, "wb") as buffer:
+            while chunk := await file.read(1024 * 1024):
+                buffer.write(chunk)
+                if buffer.tell() > BATCH_MAX_ARCHIVE_BYTES:
+                    raise HTTPException(status_code=400, detail=f"The archive is larger than {BATCH_MAX_ARCHIVE_BYTES // (1024 * 1024)} MB")
+        files = await asyncio.to_thread(_extract_archive, archive_path, target_dir)
+    except HTTPException:
+        shutil.rmtree(target_dir, ignore_errors=True)
+        raise
+    except Exception as e:
+        shutil.rmtree(target_dir, ignore_errors=True)
+        raise HTTPException(status_code=400, detail=f"Archive upload failed: {e}")
+    finally:
+        if os.path.exists(archive_path):
+            os.remove(archive_path)
+
+    return start_batch(batch_id, files, input_language, output_language, True, deadline_seconds)
+
+
+@router.post("/api/v2/document-batch/{batch_id}/resume", response_model=BatchJob, status_code=202, dependencies=[Depends(admit(BULK, "OCR", "MT"))])
+async def resume_document_batch(batch_id: str):
+    """Re-runs a batch, skipping every document that already completed."""
+    if not os.path.exists(_manifest_path(batch_id)):
+        raise HTTPException(status_code=404, detail="Batch not found")
+    previous = jobs.get(batch_id)
+    if previous and previous["status"] == "processing":
+        raise HTTPException(status_code=409, detail="Batch is still processing")
+
+    with open(_manifest_path(batch_id), encoding="utf-8") as f:
+        total = len(json.load(f)["files"])
+    done = len(_drop_failed_records(batch_id))
+    # The state goes first because workers skip a claimed job that looks finished;
+    # if the enqueue fails, the old state is put back so the batch stays resumable.
+    jobs[batch_id] = {**new_job_state(), "total": total, "done": done, "failed": 0}
+    try:
+        enqueue(batch_id, "document-batch", BULK)
+    except Exception:
+        if previous is not None:
+            jobs[batch_id] = dict(previous)
+        raise
+    return {"jobId": batch_id, **jobs[batch_id]}
+
+
+@router.get("/api/v2/document-batch/{batch_id}", response_model=BatchJob)
+async def get_document_batch_status(batch_id: str):
+    if not (job := jobs.get(batch_id)):
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return {"jobId": batch_id, **job}
+
+
+@router.get("/api/v2/document-batch/{batch_id}/results")
+async def stream_document_batch_results(batch_id: str, offset: int = 0):
+    """
+    Streams per-document results as NDJSON, following the results file until the
+    batch finishes. `offset` skips the first N lines, to resume a dropped stream.
+    """
+    if not os.path.exists(_manifest_path(batch_id)):
+        raise HTTPException(status_code=404, detail="Batch not found")
+
+    async def follow():
+        results_path = _results_path(batch_id)
+        position, skipped, pending = 0, 0, ""
+        while True:
+            job = jobs.get(batch_id)
+            finished = not job or job["status"] in TERMINAL_STATUSES
+            if os.path.exists(results_path):
+                with open(results_path, encoding="utf-8") as f:
+                    f.seek(position)
+                    chunk = f.read()
+                    position = f.tell()
+                pending += chunk
+                *lines, pending = pending.split("\n")
+                for line in lines:
+                    if skipped < offset:
+                        skipped += 1
+                        continue
+                    yield line + "\n"
+            if finished:
+                break
+            await asyncio.sleep(0.5)
+
+    return StreamingResponse(follow(), media_type="application/x-ndjson")
@@ -1,14 +1,15 @@
 # backend/v2_services/conversation_service.py
 
-from fastapi import APIRouter, BackgroundTasks, HTTPException
-from pydantic import BaseModel
-import requests
-import time
+from fastapi import APIRouter, HTTPException, Depends, Query
+from pydantic import BaseModel, Field
 import uuid
-import os
 
-# Import the shared jobs dict from main
-from .main import jobs
+# Import the shared jobs dict and v1 helpers from main
+from .main import jobs, log, playback_url, run_stage, complete_job, fail_job, new_job_state, remove_upload
+from common.deadlines import DeadlineExceeded, make_deadline
+from .scheduler import scheduler, INTERACTIVE, BULK
+from .job_queue import enqueue, register_task
+from .admission import admit
 
 router = APIRouter(tags=["Framework 5: Conversation Translator"])
 
@@ -23,11 +24,15 @@ class ConversationTurn(BaseModel):
     input_language: str
     output_language: str
     gender: str = "female"
+    # Only used by /api/v2/live-turn; batch conversations take it as a query parameter
+    deadline_seconds: float | None = Field(None, gt=0)
 
 class ConversationJob(BaseModel):
     jobId: str
     status: str
-    result: list | None = None
+    # A list of turn results when completed, a JSON error string when failed
+    result: list | str | None = None
+    skipped_stages: list[dict] | None = None
 
 # ---------------------
 # NEW MODEL FOR LIVE TURN RESPONSE
@@ -37,120 +42,83 @@ class LiveTranslationResult(BaseModel):
     speaker: str
     input_text: str
     translated_text: str
-    output_audio_url: str
-
-# ---------------------
-# POLLING HELPER (reuse)
-# ---------------------
-
-def poll_for_result(service_name: str, job_id: str, url: str) -> dict:
-    while True:
-        print(f"CONV-PIPE: Polling {service_name} job: {job_id}")
-        r = requests.get(url)
-        r.raise_for_status()
-        data = r.json()
-        if data["status"] == "completed":
-            return data["result"]
-        elif data["status"] == "failed":
-            err = data.get('result', {}).get('error', 'Unknown error')
-            raise Exception(f"{service_name} failed: {err}")
-        time.sleep(2)
+    output_audio_url: str | None  # None when there was no text to speak
+    no_audio: str | None = None  # Why output_audio_url is None, e.g. "empty_text"
 
 # ---------------------
 # PIPELINE LOGIC (EXISTING BATCH)
 # ---------------------
 
+@register_task("conversation")
 def run_conversation_pipeline(job_id: str, turns: list[ConversationTurn]):
     # ... (Your existing run_conversation_pipeline function remains here for batch processing)
+    # Turns arrive as plain dicts when the job comes from the durable queue
+    turns = [ConversationTurn(**t) if isinstance(t, dict) else t for t in turns]
     results = []
     try:
         for i, turn in enumerate(turns):
-            print(f"CONV-PIPE: Processing turn {i+1}/{len(turns)} from {turn.speaker}")
+            log.emit("conversation.turn", job_id, turn=i + 1, turns=len(turns))
 
             # 1️⃣ ASR
-            asr_payload = {"audio_file_path": turn.audio_file_path, "language": turn.input_language}
-            asr_r = requests.post("http://127.0.0.1:5001/api/v1/asr/jobs", json=asr_payload)
-            asr_r.raise_for_status()
-            asr_job = asr_r.json()["jobId"]
-            asr_res = poll_for_result("ASR", asr_job, f"http://127.0.0.1:5001/api/v1/asr/jobs/{asr_job}")
+            asr_res = run_stage("ASR", {"audio_file_path": turn.audio_file_path, "language": turn.input_language}, job_id)
             text = asr_res["text"]
 
             # 2️⃣ MT
-            mt_payload = {"text": text, "language1": turn.input_language, "language2": turn.output_language}
-            mt_r = requests.post("http://127.0.0.1:5004/api/v1/translate/jobs", json=mt_payload)
-            mt_r.raise_for_status()
-            mt_job = mt_r.json()["jobId"]
-            mt_res = poll_for_result("MT", mt_job, f"http://127.0.0.1:5004/api/v1/translate/jobs/{mt_job}")
+            mt_res = run_stage("MT", {"text": text, "language1": turn.input_language, "language2": turn.output_language}, job_id)
             translated_text = mt_res["translatedText"]
 
             # 3️⃣ TTS
-            tts_payload = {"text_to_speak": translated_text, "gender": turn.gender, "language": turn.output_language}
-            tts_r = requests.post("http://127.0.0.1:5002/api/v1/tts/jobs", json=tts_payload)
-            tts_r.raise_for_status()
-            tts_job = tts_r.json()["jobId"]
-            tts_res = poll_for_result("TTS", tts_job, f"http://127.0.0.1:5002/api/v1/tts/jobs/{tts_job}")
-            audio_url = tts_res["audio_url"]
+            tts_res = run_stage("TTS", {"text_to_speak": translated_text, "gender": turn.gender, "language": turn.output_language}, job_id)
+            audio_url = playback_url(tts_res)
 
             results.append({
                 "speaker": turn.speaker,
                 "input_text": text,
                 "translated_text": translated_text,
-                "output_audio_url": audio_url
+                "output_audio_url": audio_url,
+                "no_audio": tts_res.get("no_audio"),
             })
 
-        jobs[job_id]["status"] = "completed"
-        jobs[job_id]["result"] = results
+        complete_job(job_id, results)
 
     except Exception as e:
-        jobs[job_id]["status"] = "failed"
-        jobs[job_id]["result"] = json.dumps({"error": str(e)})
+        fail_job(job_id, e)
 
 
 # ---------------------
 # NEW LIVE PIPELINE LOGIC
 # ---------------------
 
-# NOTE: Ensure 'import os' is added to the top of conversation_service.py for this to work.
-
-def process_single_live_turn(turn: ConversationTurn) -> dict:
+def process_single_live_turn(turn: ConversationTurn, deadline: float | None = None) -> dict:
     """
     Runs the ASR -> MT -> TTS pipeline for a single turn synchronously,
     and ensures the temporary audio file is deleted afterward.
     """
     file_path = turn.audio_file_path # Get the path from the request model
-    
+    # Live turns have no v2 job; this id only ties the turn's log records together
+    turn_id = str(uuid.uuid4())
+
     try:
-        print(f"LIVE-PIPE: Processing turn from {turn.speaker}")
+        log.emit("live_turn.started", turn_id)
 
         # 1️⃣ ASR
-        asr_payload = {"audio_file_path": file_path, "language": turn.input_language}
-        asr_r = requests.post("http://127.0.0.1:5001/api/v1/asr/jobs", json=asr_payload)
-        asr_r.raise_for_status()
-        asr_job = asr_r.json()["jobId"]
-        asr_res = poll_for_result("ASR", asr_job, f"http://127.0.0.1:5001/api/v1/asr/jobs/{asr_job}")
+        asr_res = run_stage("ASR", {"audio_file_path": file_path, "language": turn.input_language}, turn_id, deadline)
         input_text = asr_res["text"]
 
         # 2️⃣ MT
-        mt_payload = {"text": input_text, "language1": turn.input_language, "language2": turn.output_language}
-        mt_r = requests.post("http://127.0.0.1:5004/api/v1/translate/jobs", json=mt_payload)
-        mt_r.raise_for_status()
-        mt_job = mt_r.json()["jobId"]
-        mt_res = poll_for_result("MT", mt_job, f"http://127.0.0.1:5004/api/v1/translate/jobs/{mt_job}")
+        mt_res = run_stage("MT", {"text": input_text, "language1": turn.input_language, "language2": turn.output_language}, turn_id, deadline)
         translated_text = mt_res["translatedText"]
 
         # 3️⃣ TTS
-        tts_payload = {"text_to_speak": translated_text, "gender": turn.gender, "language": turn.output_language}
-        tts_r = requests.post("http://127.0.0.1:5002/api/v1/tts/jobs", json=tts_payload)
-        tts_r.raise_for_status()
-        tts_job = tts_r.json()["jobId"]
-        tts_res = poll_for_result("TTS", tts_job, f"http://127.0.0.1:5002/api/v1/tts/jobs/{tts_job}")
-        output_audio_url = tts_res["audio_url"]
+        tts_res = run_stage("TTS", {"text_to_speak": translated_text, "gender": turn.gender, "language": turn.output_language}, turn_id, deadline)
+        output_audio_url = playback_url(tts_res)
 
         return {
             "speaker": turn.speaker,
             "input_text": input_text,
             "translated_text": translated_text,
-            "output_audio_url": output_audio_url
+            "output_audio_url": output_audio_url,
+            "no_audio": tts_res.get("no_audio"),
         }
 
     except Exception as e:
@@ -159,23 +127,19 @@ def process_single_live_turn(turn: ConversationTurn) -> dict:
         
     finally: # <--- CRITICAL CLEANUP BLOCK ADDED HERE
         # Delete the temporary audio file regardless of success or failure
-        try:
-            if os.path.exists(file_path):
-                os.remove(file_path)
-                print(f"LIVE-PIPE: Cleaned up temporary audio file: {file_path}")
-        except Exception as cleanup_err:
-            print(f"LIVE-PIPE: Warning: Failed to delete {file_path}: {cleanup_err}")
+        remove_upload(turn_id, file_path)
 
 
 # ---------------------
 # API ROUTES (EXISTING BATCH)
 # ---------------------
 
-@router.post("/api/v2/conversation", response_model=ConversationJob, status_code=202)
-async def start_conversation_job(turns: list[ConversationTurn], background_tasks: BackgroundTasks):
+@router.post("/api/v2/conversation", response_model=ConversationJob, status_code=202, dependencies=[Depends(admit(BULK, "ASR", "MT", "TTS"))])
+async def start_conversation_job(turns: list[ConversationTurn], deadline_seconds: float | None = Query(None, gt=0)):
     job_id = str(uuid.uuid4())
-    jobs[job_id] = {"status": "processing", "result": None}
-    background_tasks.add_task(run_conversation_pipeline, job_id, turns)
+    jobs[job_id] = new_job_state(deadline_seconds)
+    # Batch conversations run in the bulk class so they never delay live turns
+    enqueue(job_id, "conversation", BULK, [t.model_dump() for t in turns])
     return {"jobId": job_id, "status": "processing"}
 
 @router.get("/api/v2/conversation/jobs/{job_id}", response_model=ConversationJob)
@@ -188,13 +152,16 @@ async def get_conversation_status(job_id: str):
 # NEW LIVE API ROUTE
 # ---------------------
 
-@router.post("/api/v2/live-turn", response_model=LiveTranslationResult, status_code=200)
+@router.post("/api/v2/live-turn", response_model=LiveTranslationResult, status_code=200, dependencies=[Depends(admit(INTERACTIVE, "ASR", "MT", "TTS"))])
 async def process_live_translation_turn(turn: ConversationTurn):
     """
     Processes a single audio turn immediately and synchronously for a live interpreter experience.
     """
     try:
-        result = process_single_live_turn(turn)
+        # Runs on the interactive pool, off the event loop and ahead of batch work
+        result = await scheduler.run(INTERACTIVE, process_single_live_turn, turn, make_deadline(turn.deadline_seconds))
         return result
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=f"Live turn processing failed: {e}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Live turn processing failed: {e}")
\ No newline at end of file
@@ -0,0 +1,194 @@
+# backend/v2_services/job_queue.py
+#
+# Durable job queue for the v2 pipelines.
+#
+# In the default "inline" mode, pipelines run on the in-process priority
+# scheduler, exactly as before. With V2_JOB_QUEUE=durable, the web process only
+# records the job in a local SQLite database; a separate pool of worker processes
+# (python -m v2_services.worker) claims and runs it. Job status and results go
+# to the shared job-state store (common/job_state.py), so they survive restarts
+# and are visible to every process.
+#
+# Crash recovery works with leases: a worker renews the lease of each job it is
+# running, and a job whose lease expires (its worker died) is claimed again by
+# another worker, up to V2_JOB_MAX_ATTEMPTS times.
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from common.job_state import create_job_store as create_state_store, JOB_STATE_BACKEND
+from common.event_log import EventLog
+from .scheduler import scheduler, INTERACTIVE, STANDARD, BULK, DEFAULT_SHARES
+
+QUEUE_MODE = os.getenv("V2_JOB_QUEUE", "inline").lower()
+JOB_DB_PATH = os.getenv("V2_JOB_DB", os.path.join(os.path.dirname(os.path.abspath(__file__)), "jobs.db"))
+LEASE_SECONDS = float(os.getenv("V2_JOB_LEASE_SECONDS", "60"))
+MAX_ATTEMPTS = int(os.getenv("V2_JOB_MAX_ATTEMPTS", "3"))
+
+log = EventLog("v2")
+
+PRIORITY_RANK = {INTERACTIVE: 0, STANDARD: 1, BULK: 2}
+
+# Pipeline functions, by name, that workers are allowed to run.
+TASKS = {}
+
+
+def register_task(name: str):
+    """Decorator that makes a pipeline function runnable from the durable queue."""
+    def decorator(fn):
+        TASKS[name] = fn
+        return fn
+    return decorator
+
+
+# --- SQLite connection (one per thread) ---
+
+_local = threading.local()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS job_queue (
+    job_id TEXT PRIMARY KEY,
+    task TEXT NOT NULL,
+    priority TEXT NOT NULL,
+    priority_rank INTEGER NOT NULL,
+    args TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_until REAL,
+    worker TEXT,
+    enqueued_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS job_queue_claim ON job_queue (status, priority_rank, enqueued_at);
+"""
+
+
+def connect() -> sqlite3.Connection:
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(JOB_DB_PATH, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(SCHEMA)
+        _local.conn = conn
+    return conn
+
+
+# --- Job state (status/result) ---
+
+def state_backend() -> str:
+    """
+    The durable queue needs job state every process can see, so it upgrades the
+    default in-memory backend to SQLite; an explicit JOB_STATE_BACKEND is kept.
+    """
+    if QUEUE_MODE == "durable" and JOB_STATE_BACKEND == "memory":
+        return "sqlite"
+    return JOB_STATE_BACKEND
+
+
+def create_job_store():
+    return create_state_store("v2", state_backend())
+
+
+# --- Queue ---
+
+def enqueue(job_id: str, task: str, priority: str, *args):
+    """Runs a registered pipeline task, either in-process or through the durable queue."""
+    log.emit("job.queued", job_id, task=task, priority=priority, queue=QUEUE_MODE)
+    if QUEUE_MODE != "durable":
+        scheduler.submit(priority, TASKS[task], job_id, *args)
+        return
+
+    # A resumed batch reuses its job_id, so an old row is put back in the queue
+    connect().execute(
+        "INSERT INTO job_queue (job_id, task, priority, priority_rank, args, status, enqueued_at) "
+        "VALUES (?, ?, ?, ?, ?, 'queued', ?) "
+        "ON CONFLICT(job_id) DO UPDATE SET task = excluded.task, priority = excluded.priority, "
+        "priority_rank = excluded.priority_rank, args = excluded.args, status = 'queued', attempts = 0, "
+        "lease_until = NULL, worker = NULL, enqueued_at = excluded.enqueued_at",
+        (job_id, task, priority, PRIORITY_RANK[priority], json.dumps(list(args)), time.time()),
+    )
+
+
+def claim(worker: str, class_limits: dict[str, int]) -> dict | None:
+    """
+    Atomically claims the next runnable job: highest priority first, oldest first,
+    skipping classes that already use their full concurrency share. Jobs whose
+    lease expired (their worker crashed) are claimable again.
+    """
+    conn = connect()
+    now = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        running = dict(conn.execute(
+            "SELECT priority, COUNT(*) FROM job_queue WHERE status = 'running' AND lease_until > ? GROUP BY priority",
+            (now,),
+        ).fetchall())
+        allowed = [p for p, limit in class_limits.items() if running.get(p, 0) < limit]
+        if not allowed:
+            conn.execute("COMMIT")
+            return None
+
+        placeholders = ",".join("?" for _ in allowed)
+        row = conn.execute(
+            f"SELECT job_id, task, priority, args, attempts FROM job_queue "
+            f"WHERE (status = 'queued' OR (status = 'running' AND lease_until <= ?)) AND priority IN ({placeholders}) "
+            f"ORDER BY priority_rank, enqueued_at LIMIT 1",
+            (now, *allowed),
+        ).fetchone()
+        if row is None:
+            conn.execute("COMMIT")
+            return None
+
+        job_id, task, priority, args, attempts = row
+        if attempts >= MAX_ATTEMPTS:
+            conn.execute("UPDATE job_queue SET status = 'done' WHERE job_id = ?", (job_id,))
+            conn.execute("COMMIT")
+            create_job_store()[job_id] = {
+                "status": "failed",
+                "result": json.dumps({"error": f"Job abandoned after {attempts} interrupted attempts"}),
+            }
+            return claim(worker, class_limits)
+
+        conn.execute(
+            "UPDATE job_queue SET status = 'running', attempts = attempts + 1, lease_until = ?, worker = ? WHERE job_id = ?",
+            (now + LEASE_SECONDS, worker, job_id),
+        )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+    return {"job_id": job_id, "task": task, "priority": priority, "args": json.loads(args), "attempt": attempts + 1}
+
+
+def renew_leases(worker: str, job_ids: list[str]):
+    if not job_ids:
+        return
+    placeholders = ",".join("?" for _ in job_ids)
+    connect().execute(
+        f"UPDATE job_queue SET lease_until = ? WHERE worker = ? AND status = 'running' AND job_id IN ({placeholders})",
+        (time.time() + LEASE_SECONDS, worker, *job_ids),
+    )
+
+
+def cancel_queued(job_id: str):
+    """Drops a job that no worker has claimed yet. Running jobs stop at their next stage boundary."""
+    if QUEUE_MODE == "durable":
+        connect().execute("UPDATE job_queue SET status = 'done' WHERE job_id = ? AND status = 'queued'", (job_id,))
+
+
+def complete(job_id: str):
+    connect().execute("UPDATE job_queue SET status = 'done', lease_until = NULL WHERE job_id = ?", (job_id,))
+
+
+def queue_stats() -> dict:
+    rows = connect().execute(
+        "SELECT priority, status, COUNT(*) FROM job_queue WHERE status != 'done' GROUP BY priority, status"
+    ).fetchall()
+    stats = {p: {"queued": 0, "running": 0} for p in DEFAULT_SHARES}
+    for priority, status, count in rows:
+        stats.setdefault(priority, {"queued": 0, "running": 0})[status] = count
+    return stats
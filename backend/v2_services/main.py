@@ -1,6 +1,8 @@
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi import FastAPI, BackgroundTasks, HTTPException
-from pydantic import BaseModel
+from fastapi import FastAPI, HTTPException, Request, Depends
+from pydantic import BaseModel, Field
+from typing import Annotated
+from concurrent.futures import ThreadPoolExecutor
 import uuid
 import time
 import requests
@@ -10,8 +12,20 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+from common.audio_store import get_audio_store, audio_file_response
+from common.deadlines import DeadlineExceeded, make_deadline, remaining_seconds, http_timeout
+from common.event_log import EventLog
+from common.job_state import append_to_job
+from common.profiling import install_profiling
+from .scheduler import scheduler, STANDARD
+from .planner import plan_stage, remember, NO_AUDIO_EMPTY_TEXT
+from .admission import admit, admission_stats, record_upstream
+from .job_queue import create_job_store, enqueue, register_task, queue_stats, cancel_queued, QUEUE_MODE
+
 app = FastAPI(title="Bhashini V2 Orchestration Service")
 
+log = EventLog("v2")
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  # Allows all origins
@@ -19,9 +33,19 @@ app.add_middleware(
     allow_methods=["*"],  # Allows all methods (GET, POST, etc.)
     allow_headers=["*"],  # Allows all headers
 )
+install_profiling(app)
+
+# This is the central "database" for all orchestration jobs: an in-memory dict,
+# or the shared SQLite store when pipelines run on the durable queue.
+jobs = create_job_store()
 
-# This is the central in-memory "database" for all orchestration jobs.
-jobs = {}
+
+def new_job_state(deadline_seconds: float | None = None) -> dict:
+    """Initial state of a v2 job; `deadline` is an absolute epoch time shared with the v1 jobs."""
+    state = {"status": "processing", "result": None}
+    if (deadline := make_deadline(deadline_seconds)) is not None:
+        state["deadline"] = deadline
+    return state
 
 # --- Pydantic Models ---
 
@@ -29,286 +53,419 @@ class Job(BaseModel):
     """A generic model to represent the status of any asynchronous job."""
     jobId: str
     status: str
-    result: str | None = None
+    # A string for a single output language; {language: {"status", "result" | "error"}} for a list
+    result: str | dict | None = None
+    # Stages the planner elided, e.g. {"stage": "MT", "language": "HINDI", "reason": "same_language"}
+    skipped_stages: list[dict] | None = None
+    # Why an audio job completed without audio (its result is then None), e.g. "empty_text"
+    no_audio: str | None = None
+
+# One target language, or a non-empty list of them
+OutputLanguages = str | Annotated[list[str], Field(min_length=1)]
 
 # Models for the request bodies of our frameworks
 class DocumentTranslationRequest(BaseModel):
     image_file_path: str
     input_language: str
-    output_language: str
+    output_language: OutputLanguages
+    deadline_seconds: float | None = Field(None, gt=0)
 
 
 class SpeechTranslationRequest(BaseModel):
     audio_file_path: str
     input_language: str
-    output_language: str    
+    output_language: OutputLanguages
+    deadline_seconds: float | None = Field(None, gt=0)
 
 class TextToSpeechRequest(BaseModel):
     text: str
     gender: str = "female"
     input_language: str
-    output_language: str
+    output_language: OutputLanguages
+    deadline_seconds: float | None = Field(None, gt=0)
 
 # NEW: Request model for the Speech-to-Speech pipeline
 class SpeechToSpeechRequest(BaseModel):
     audio_file_path: str
     gender: str = "female"
     input_language: str
-    output_language: str
+    output_language: OutputLanguages
+    deadline_seconds: float | None = Field(None, gt=0)
 
 
 class TextToTextRequest(BaseModel):
     text: str
     input_language: str
-    output_language: str
+    output_language: OutputLanguages
+    deadline_seconds: float | None = Field(None, gt=0)
+
+# --- Reusable Helpers for calling the v1 services ---
+
+V1_JOB_URLS = {
+    "ASR": "http://127.0.0.1:5001/api/v1/asr/jobs",
+    "TTS": "http://127.0.0.1:5002/api/v1/tts/jobs",
+    "OCR": "http://127.0.0.1:5003/api/v1/ocr/jobs",
+    "MT": "http://127.0.0.1:5004/api/v1/translate/jobs",
+}
+
+
+class JobCancelled(Exception):
+    """Raised at a stage boundary when the v2 job has been cancelled."""
+
+
+class V1JobFailed(Exception):
+    """A v1 job that ended "failed"; `kind` is the error kind the service reported, if any."""
+
+    def __init__(self, message: str, kind: str | None = None):
+        super().__init__(message)
+        self.kind = kind
+
+
+# Failures caused by our configuration or the request itself, not by the upstream API
+CLIENT_ERROR_KINDS = {"config", "validation"}
+
+
+def check_job_active(job_id: str | None, deadline: float | None = None) -> float | None:
+    """
+    Stage-boundary check: raises JobCancelled if the job was cancelled, and
+    DeadlineExceeded if its deadline has passed. Returns the effective deadline.
+    """
+    if job_id is not None and (job := jobs.get(job_id)):
+        if job["status"] == "cancelled":
+            raise JobCancelled(f"Job {job_id} was cancelled")
+        deadline = job.get("deadline", deadline)
+    if deadline is not None and remaining_seconds(deadline) <= 0:
+        raise DeadlineExceeded("Deadline exceeded")
+    return deadline
+
 
-# --- Reusable Helper Function for Polling ---
+def v1_request(service_name: str, method: str, url: str, **kwargs) -> requests.Response:
+    """Sends one HTTP request to a v1 service; raises on connection and HTTP errors."""
+    response = requests.request(method, url, **kwargs)
+    response.raise_for_status()
+    return response
 
-def poll_for_result(service_name: str, job_id: str, url: str) -> dict:
+
+def _counts_against_upstream(error: Exception, deadline: float | None) -> bool:
+    """Whether a failed stage says something about the v1 service's health (see admission.py)."""
+    if isinstance(error, (JobCancelled, DeadlineExceeded)):
+        return False
+    if isinstance(error, requests.exceptions.HTTPError) and error.response is not None and error.response.status_code < 500:
+        return False
+    if isinstance(error, V1JobFailed) and error.kind in CLIENT_ERROR_KINDS:
+        return False
+    # A v1 job that failed because our own deadline ran out is not the service's fault
+    return deadline is None or remaining_seconds(deadline) > 0
+
+
+def poll_for_result(service_name: str, job_id: str, url: str, parent_job_id: str | None = None, deadline: float | None = None) -> dict:
     """A helper function to poll any v1 service job until it's complete or fails."""
+    started = time.perf_counter()
     while True:
-        print(f"ORCHESTRATOR: Polling {service_name} job: {job_id}")
-        response = requests.get(url)
-        response.raise_for_status()
+        # Stop polling as soon as the parent v2 job is cancelled or out of time
+        deadline = check_job_active(parent_job_id, deadline)
+
+        log.emit("poll", parent_job_id, stage=service_name, v1_job_id=job_id)
+        response = v1_request(service_name, "GET", url, timeout=http_timeout(deadline))
         try:
             data = response.json()
         except requests.exceptions.JSONDecodeError as e:
             # If the V1 service returns text that isn't JSON (e.g., an HTML error page),
             # log it and treat it as a failure.
-            print(f"ORCHESTRATOR ERROR: V1 service returned non-JSON response for {service_name}. Content: {response.text}")
+            log.error("stage.invalid_response", parent_job_id, stage=service_name, v1_job_id=job_id, content=response.text[:500])
             raise Exception(f"{service_name} returned invalid response format: {e}")
         
         if data["status"] == "completed":
-            print(f"ORCHESTRATOR: {service_name} job {job_id} completed.")
+            log.emit("stage.completed", parent_job_id, stage=service_name, v1_job_id=job_id,
+                     duration_ms=round((time.perf_counter() - started) * 1000, 1))
             return data["result"]
         elif data["status"] == "failed":
-            error_details = data.get('result', {}).get('error', 'Unknown error')
-            raise Exception(f"{service_name} service failed: {error_details}")
+            error_result = data.get('result') or {}
+            error_details = error_result.get('error', 'Unknown error')
+            log.error("stage.failed", parent_job_id, stage=service_name, v1_job_id=job_id, error=error_details, kind=error_result.get('kind'))
+            raise V1JobFailed(f"{service_name} service failed: {error_details}", error_result.get('kind'))
         
-        time.sleep(2)
+        remaining = remaining_seconds(deadline)
+        time.sleep(2 if remaining is None else max(0.0, min(2, remaining)))
+
+
+def call_v1_service(service_name: str, payload: dict, parent_job_id: str | None = None, deadline: float | None = None) -> dict:
+    """Starts a v1 job, passing the deadline down, and polls it to completion."""
+    deadline = check_job_active(parent_job_id, deadline)
+    if deadline is not None:
+        payload = {**payload, "deadline": deadline}
+    if parent_job_id is not None:
+        payload = {**payload, "trace_id": parent_job_id}
+
+    try:
+        response = v1_request(service_name, "POST", V1_JOB_URLS[service_name], json=payload, timeout=http_timeout(deadline))
+        v1_job_id = response.json()["jobId"]
+        log.emit("stage.started", parent_job_id, stage=service_name, v1_job_id=v1_job_id,
+                 language=payload.get("language2") or payload.get("language"))
+        result = poll_for_result(service_name, v1_job_id, f"{V1_JOB_URLS[service_name]}/{v1_job_id}", parent_job_id, deadline)
+    except Exception as e:
+        # Failed calls and v1 jobs that ended "failed" both feed admission control
+        if _counts_against_upstream(e, deadline):
+            record_upstream(service_name, False)
+        raise
+    record_upstream(service_name, True)
+    return result
+
+
+def run_stage(service_name: str, payload: dict, parent_job_id: str | None = None, deadline: float | None = None,
+              skipped: list | None = None) -> dict:
+    """
+    Runs one pipeline stage, unless the planner can elide it (see planner.py).
+    Elided stages are recorded in the job's `skipped_stages`, or in `skipped`
+    when given (batches keep them per document).
+    """
+    deadline = check_job_active(parent_job_id, deadline)
+    reason, result, key = plan_stage(service_name, payload)
+    if reason is None:
+        result = call_v1_service(service_name, payload, parent_job_id, deadline)
+        remember(key, result)
+        return result
+
+    entry = {"stage": service_name, "language": payload.get("language2") or payload.get("language"), "reason": reason}
+    log.emit("stage.skipped", parent_job_id, **entry)
+    if skipped is not None:
+        skipped.append(entry)
+    elif parent_job_id is not None:
+        # Fan-out targets skip stages concurrently; the append is atomic in every store
+        append_to_job(jobs, parent_job_id, "skipped_stages", entry)
+    return result
+
+
+def complete_job(job_id: str, result, status: str = "completed"):
+    # A job cancelled while its last stage was running keeps its cancelled state
+    if jobs[job_id]["status"] == "cancelled":
+        return
+    jobs[job_id].update(status=status, result=result)
+    log.emit("job.finished", job_id, status=status)
+
+
+def fail_job(job_id: str, error: Exception):
+    if isinstance(error, JobCancelled):
+        log.emit("job.cancelled", job_id)
+        return
+    log.error("job.failed", job_id, error=str(error))
+    jobs[job_id].update(status="failed", result=json.dumps({"error": str(error)}))
+
+
+# --- Multi-target fan-out ---
+
+FANOUT_MAX_PARALLEL = int(os.getenv("V2_FANOUT_MAX_PARALLEL", "4"))
+
+
+def normalize_targets(output_language: str | list[str]) -> str | list[str]:
+    """Upper-cases the target language(s); a list keeps its order and drops duplicates."""
+    if isinstance(output_language, str):
+        return output_language.upper()
+    if not output_language:
+        raise HTTPException(status_code=400, detail="output_language must name at least one language")
+    return list(dict.fromkeys(lang.upper() for lang in output_language))
+
+
+def complete_targets(job_id: str, output_language: str | list[str], run_target):
+    """
+    Runs the per-target stages (MT, TTS) once the source stage is done.
+
+    A single target language behaves exactly as before. For a list, each target
+    runs in parallel and the job result is {language: {"status", "result" | "error"}};
+    the job is "completed" when every target succeeded, "partially_completed" when
+    only some did, and "failed" when none did.
+
+    Audio targets with nothing to speak return None (see playback_url); they
+    complete with result None and `no_audio` set, on the job or per language.
+    """
+    if isinstance(output_language, str):
+        result = run_target(output_language)
+        if result is None:
+            jobs[job_id]["no_audio"] = NO_AUDIO_EMPTY_TEXT
+        complete_job(job_id, result)
+        return
+
+    def run_one(target: str) -> dict:
+        try:
+            result = run_target(target)
+            if result is None:
+                return {"status": "completed", "result": None, "no_audio": NO_AUDIO_EMPTY_TEXT}
+            return {"status": "completed", "result": result}
+        except JobCancelled:
+            raise
+        except Exception as e:
+            return {"status": "failed", "error": str(e)}
+
+    with ThreadPoolExecutor(max_workers=max(1, min(FANOUT_MAX_PARALLEL, len(output_language)))) as pool:
+        outcomes = dict(zip(output_language, pool.map(run_one, output_language)))
+
+    succeeded = sum(o["status"] == "completed" for o in outcomes.values())
+    if succeeded == len(outcomes):
+        complete_job(job_id, outcomes)
+    elif succeeded:
+        complete_job(job_id, outcomes, status="partially_completed")
+    else:
+        complete_job(job_id, outcomes, status="failed")
+
+
+def remove_upload(job_id: str, file_path: str):
+    """Deletes a pipeline's uploaded input file once the job is done with it."""
+    try:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+            log.emit("file.removed", job_id, path=file_path)
+    except Exception as cleanup_err:
+        log.warning("file.remove_failed", job_id, path=file_path, error=str(cleanup_err))
+
+
+def playback_url(tts_result: dict) -> str | None:
+    """
+    Prefers the locally stored copy of TTS audio (served by /api/v2/audio) over the
+    upstream URL. None when the planner skipped TTS because there was nothing to speak.
+    """
+    if tts_result.get("no_audio"):
+        return None
+    if tts_result.get("audio_id"):
+        return f"/api/v2/audio/{tts_result['audio_id']}"
+    return tts_result["audio_url"]
 
 
 # --- Framework 1: Document (Image) Translation Pipeline (No changes) ---
 
-def run_document_translation_pipeline(job_id: str, file_path: str, input_language: str, output_language: str):
+@register_task("document-translation")
+def run_document_translation_pipeline(job_id: str, file_path: str, input_language: str, output_language: str | list[str]):
     try:
-        # Step 1: Call OCR to get Malayalam text from an image
-        print("ORCHESTRATOR (DOC-PIPE): Calling v1 OCR service.")
-        ocr_payload = {"image_file_path": file_path, "language": input_language}
-        ocr_response = requests.post("http://127.0.0.1:5003/api/v1/ocr/jobs", json=ocr_payload)
-        ocr_response.raise_for_status()
-        ocr_job_id = ocr_response.json()["jobId"]
-        ocr_result = poll_for_result("OCR", ocr_job_id, f"http://127.0.0.1:5003/api/v1/ocr/jobs/{ocr_job_id}")
+        # Step 1: Call OCR to get Malayalam text from an image (once, for every target)
+        ocr_result = run_stage("OCR", {"image_file_path": file_path, "language": input_language}, job_id)
         extracted_text = ocr_result["text"]
 
         # Step 2: Call MT to translate the extracted Malayalam text to English
-        print("ORCHESTRATOR (DOC-PIPE): Calling v1 MT service.")
-        mt_payload = {"text": extracted_text, "language1": input_language, "language2": output_language}
-        mt_response = requests.post("http://127.0.0.1:5004/api/v1/translate/jobs", json=mt_payload)
-        mt_response.raise_for_status()
-        mt_job_id = mt_response.json()["jobId"]
-        mt_result = poll_for_result("MT", mt_job_id, f"http://127.0.0.1:5004/api/v1/translate/jobs/{mt_job_id}")
-        translated_text = mt_result["translatedText"]
-
-        jobs[job_id]["status"] = "completed"
-        jobs[job_id]["result"] = translated_text
+        def translate(target: str) -> str:
+            mt_result = run_stage("MT", {"text": extracted_text, "language1": input_language, "language2": target}, job_id)
+            return mt_result["translatedText"]
+
+        complete_targets(job_id, output_language, translate)
     except Exception as e:
-        jobs[job_id]["status"] = "failed"
-        jobs[job_id]["result"] = json.dumps({"error": str(e)})
-    finally: # <--- ADD THIS BLOCK
-        try:
-            if os.path.exists(file_path):
-                os.remove(file_path)
-                print(f"ORCHESTRATOR (DOC-PIPE): Cleaned up file: {file_path}")
-        except Exception as cleanup_err:
-            print(f"ORCHESTRATOR (DOC-PIPE): Warning: Failed to delete {file_path}: {cleanup_err}")
+        fail_job(job_id, e)
+    finally:
+        remove_upload(job_id, file_path)
 
 # --- Framework 2: Speech Translation Pipeline (No changes) ---
 
-def run_speech_translation_pipeline(job_id: str, file_path: str, input_language: str, output_language: str):
+@register_task("speech-translation")
+def run_speech_translation_pipeline(job_id: str, file_path: str, input_language: str, output_language: str | list[str]):
     try:
-        # Step 1: Call ASR to get Malayalam text from audio
-        print("ORCHESTRATOR (SPEECH-PIPE): Calling v1 ASR service.")
-        asr_payload = {"audio_file_path": file_path, "language": input_language}
-        asr_response = requests.post("http://127.0.0.1:5001/api/v1/asr/jobs", json=asr_payload)
-        asr_response.raise_for_status()
-        asr_job_id = asr_response.json()["jobId"]
-        asr_result = poll_for_result("ASR", asr_job_id, f"http://127.0.0.1:5001/api/v1/asr/jobs/{asr_job_id}")
+        # Step 1: Call ASR to get Malayalam text from audio (once, for every target)
+        asr_result = run_stage("ASR", {"audio_file_path": file_path, "language": input_language}, job_id)
         transcribed_text = asr_result["text"]
 
         # Step 2: Call MT to translate the transcribed Malayalam text to English
-        print("ORCHESTRATOR (SPEECH-PIPE): Calling v1 MT service.")
-        mt_payload = {"text": transcribed_text, "language1": input_language, "language2": output_language}
-        mt_response = requests.post("http://127.0.0.1:5004/api/v1/translate/jobs", json=mt_payload)
-        mt_response.raise_for_status()
-        mt_job_id = mt_response.json()["jobId"]
-        mt_result = poll_for_result("MT", mt_job_id, f"http://127.0.0.1:5004/api/v1/translate/jobs/{mt_job_id}")
-        translated_text = mt_result["translatedText"]
-
-        jobs[job_id]["status"] = "completed"
-        jobs[job_id]["result"] = translated_text
+        def translate(target: str) -> str:
+            mt_result = run_stage("MT", {"text": transcribed_text, "language1": input_language, "language2": target}, job_id)
+            return mt_result["translatedText"]
+
+        complete_targets(job_id, output_language, translate)
     except Exception as e:
-        jobs[job_id]["status"] = "failed"
-        jobs[job_id]["result"] = json.dumps({"error": str(e)}) 
-    finally: # <--- ADD THIS BLOCK
-        try:
-            if os.path.exists(file_path):
-                os.remove(file_path)
-                print(f"ORCHESTRATOR (DOC-PIPE): Cleaned up file: {file_path}")
-        except Exception as cleanup_err:
-            print(f"ORCHESTRATOR (DOC-PIPE): Warning: Failed to delete {file_path}: {cleanup_err}")
+        fail_job(job_id, e)
+    finally:
+        remove_upload(job_id, file_path)
 
 
 # --- Framework 3: Text-to-Speech Synthesis Pipeline (No changes) ---
 
-def run_text_to_speech_pipeline(job_id: str, text: str, gender: str, input_language: str, output_language: str):
+@register_task("text-to-speech")
+def run_text_to_speech_pipeline(job_id: str, text: str, gender: str, input_language: str, output_language: str | list[str]):
     try:
-        # Step 1: Call MT to translate English text to Malayalam
-        print("ORCHESTRATOR (TTS-PIPE): Calling v1 MT service.")
-        mt_payload = {"text": text, "language1": input_language, "language2": output_language}
-        mt_response = requests.post("http://127.0.0.1:5004/api/v1/translate/jobs", json=mt_payload)
-        mt_response.raise_for_status()
-        mt_job_id = mt_response.json()["jobId"]
-        mt_result = poll_for_result("MT", mt_job_id, f"http://127.0.0.1:5004/api/v1/translate/jobs/{mt_job_id}")
-        translated_text = mt_result["translatedText"]
-
-        # Step 2: Call TTS to get Malayalam speech from the translated text
-        print("ORCHESTRATOR (TTS-PIPE): Calling v1 TTS service.")
-        tts_payload = {"text_to_speak": translated_text, "gender": gender, "language": output_language}
-        tts_response = requests.post("http://127.0.0.1:5002/api/v1/tts/jobs", json=tts_payload)
-        tts_response.raise_for_status()
-        tts_job_id = tts_response.json()["jobId"]
-        tts_result = poll_for_result("TTS", tts_job_id, f"http://127.0.0.1:5002/api/v1/tts/jobs/{tts_job_id}")
-        audio_url = tts_result["audio_url"]
-        
-        jobs[job_id]["status"] = "completed"
-        jobs[job_id]["result"] = audio_url
+        def synthesize(target: str) -> str:
+            # Step 1: Call MT to translate English text to Malayalam
+            mt_result = run_stage("MT", {"text": text, "language1": input_language, "language2": target}, job_id)
+            translated_text = mt_result["translatedText"]
+
+            # Step 2: Call TTS to get Malayalam speech from the translated text
+            tts_result = run_stage("TTS", {"text_to_speak": translated_text, "gender": gender, "language": target}, job_id)
+            return playback_url(tts_result)
+
+        complete_targets(job_id, output_language, synthesize)
     except Exception as e:
-        jobs[job_id]["status"] = "failed"
-        jobs[job_id]["result"] = json.dumps({"error": str(e)}) 
+        fail_job(job_id, e)
 
 # --- NEW: Framework 4: Speech-to-Speech Translation Pipeline ---
 
-def run_speech_to_speech_pipeline(job_id: str, file_path: str, gender: str, input_language: str, output_language: str):
+@register_task("speech-to-speech")
+def run_speech_to_speech_pipeline(job_id: str, file_path: str, gender: str, input_language: str, output_language: str | list[str]):
     try:
-        # Step 1: Call ASR to get Malayalam text from audio
-        print("ORCHESTRATOR (S2S-PIPE): Calling v1 ASR service.")
-        asr_payload = {"audio_file_path": file_path, "language": input_language}
-        asr_response = requests.post("http://127.0.0.1:5001/api/v1/asr/jobs", json=asr_payload)
-        asr_response.raise_for_status()
-        asr_job_id = asr_response.json()["jobId"]
-        asr_result = poll_for_result("ASR", asr_job_id, f"http://127.0.0.1:5001/api/v1/asr/jobs/{asr_job_id}")
+        # Step 1: Call ASR to get Malayalam text from audio (once, for every target)
+        asr_result = run_stage("ASR", {"audio_file_path": file_path, "language": input_language}, job_id)
         transcribed_text = asr_result["text"]
 
-        # Step 2: Call MT to translate the transcribed Malayalam text to English
-        print("ORCHESTRATOR (S2S-PIPE): Calling v1 MT service.")
-        mt_payload = {"text": transcribed_text, "language1": input_language, "language2": output_language}
-        mt_response = requests.post("http://127.0.0.1:5004/api/v1/translate/jobs", json=mt_payload)
-        mt_response.raise_for_status()
-        mt_job_id = mt_response.json()["jobId"]
-        mt_result = poll_for_result("MT", mt_job_id, f"http://127.0.0.1:5004/api/v1/translate/jobs/{mt_job_id}")
-        translated_text = mt_result["translatedText"]
-
-        # Step 3: Call TTS to get English speech from the translated English text
-        print(f"ORCHESTRATOR (S2S-PIPE): Calling v1 TTS service for {output_language}.")
-        tts_payload = {"text_to_speak": translated_text, "gender": gender, "language": output_language}
-        tts_response = requests.post("http://127.0.0.1:5002/api/v1/tts/jobs", json=tts_payload)
-        tts_response.raise_for_status()
-        tts_job_id = tts_response.json()["jobId"]
-        tts_result = poll_for_result("TTS", tts_job_id, f"http://127.0.0.1:5002/api/v1/tts/jobs/{tts_job_id}")
-        audio_url = tts_result["audio_url"]
-        
-        jobs[job_id]["status"] = "completed"
-        jobs[job_id]["result"] = audio_url
+        def translate_and_speak(target: str) -> str:
+            # Step 2: Call MT to translate the transcribed Malayalam text to English
+            mt_result = run_stage("MT", {"text": transcribed_text, "language1": input_language, "language2": target}, job_id)
+            translated_text = mt_result["translatedText"]
+
+            # Step 3: Call TTS to get English speech from the translated English text
+            tts_result = run_stage("TTS", {"text_to_speak": translated_text, "gender": gender, "language": target}, job_id)
+            return playback_url(tts_result)
+
+        complete_targets(job_id, output_language, translate_and_speak)
     except Exception as e:
-        jobs[job_id]["status"] = "failed"
-        jobs[job_id]["result"] = json.dumps({"error": str(e)})
-    finally: # <--- ADD THIS BLOCK
-        try:
-            if os.path.exists(file_path):
-                os.remove(file_path)
-                print(f"ORCHESTRATOR (DOC-PIPE): Cleaned up file: {file_path}")
-        except Exception as cleanup_err:
-            print(f"ORCHESTRATOR (DOC-PIPE): Warning: Failed to delete {file_path}: {cleanup_err}")
+        fail_job(job_id, e)
+    finally:
+        remove_upload(job_id, file_path)
 
 
 
 # frame 5 text to text
-def run_text_to_text_pipeline(job_id: str, text: str, input_language: str, output_language: str):
+@register_task("text-to-text")
+def run_text_to_text_pipeline(job_id: str, text: str, input_language: str, output_language: str | list[str]):
     try:
         # Step 1: Call MT to translate (This is the entire pipeline)
-        print("ORCHESTRATOR (T2T-PIPE): Calling v1 MT service.")
-        mt_payload = {"text": text, "language1": input_language, "language2": output_language}
-        mt_response = requests.post("http://127.0.0.1:5004/api/v1/translate/jobs", json=mt_payload)
-        mt_response.raise_for_status()
-        mt_job_id = mt_response.json()["jobId"]
-        mt_result = poll_for_result("MT", mt_job_id, f"http://127.0.0.1:5004/api/v1/translate/jobs/{mt_job_id}")
-        translated_text = mt_result["translatedText"]
-        
-        jobs[job_id]["status"] = "completed"
-        jobs[job_id]["result"] = translated_text
+        def translate(target: str) -> str:
+            mt_result = run_stage("MT", {"text": text, "language1": input_language, "language2": target}, job_id)
+            return mt_result["translatedText"]
+
+        complete_targets(job_id, output_language, translate)
     except Exception as e:
-        jobs[job_id]["status"] = "failed"
-        jobs[job_id]["result"] = json.dumps({"error": str(e)}) # <-- FIX: JSON DUMP APPLIED
+        fail_job(job_id, e)
 
 
 # In backend/v2_services/main.py
 
 # --- NEW: Framework 6: Image-to-Audio Pipeline (OCR -> MT -> TTS) ---
 
-def run_image_to_audio_pipeline(job_id: str, file_path: str, input_language: str, output_language: str):
+@register_task("image-to-audio")
+def run_image_to_audio_pipeline(job_id: str, file_path: str, input_language: str, output_language: str | list[str]):
     try:
-        # Step 1: Call OCR to get text from the image
-        print("ORCHESTRATOR (I2A-PIPE): Calling v1 OCR service.")
-        ocr_payload = {"image_file_path": file_path, "language": input_language}
-        ocr_response = requests.post("http://127.0.0.1:5003/api/v1/ocr/jobs", json=ocr_payload)
-        ocr_response.raise_for_status()
-        ocr_job_id = ocr_response.json()["jobId"]
-        ocr_result = poll_for_result("OCR", ocr_job_id, f"http://127.0.0.1:5003/api/v1/ocr/jobs/{ocr_job_id}")
+        # Step 1: Call OCR to get text from the image (once, for every target)
+        ocr_result = run_stage("OCR", {"image_file_path": file_path, "language": input_language}, job_id)
         extracted_text = ocr_result["text"]
 
-        # Step 2: Call MT to translate the extracted text
-        print("ORCHESTRATOR (I2A-PIPE): Calling v1 MT service.")
-        mt_payload = {"text": extracted_text, "language1": input_language, "language2": output_language}
-        mt_response = requests.post("http://127.0.0.1:5004/api/v1/translate/jobs", json=mt_payload)
-        mt_response.raise_for_status()
-        mt_job_id = mt_response.json()["jobId"]
-        mt_result = poll_for_result("MT", mt_job_id, f"http://127.0.0.1:5004/api/v1/translate/jobs/{mt_job_id}")
-        translated_text = mt_result["translatedText"]
-        
-        # Step 3: Call TTS to get audio output
-        print(f"ORCHESTRATOR (I2A-PIPE): Calling v1 TTS service for {output_language}.")
-        # NOTE: We assume 'female' gender, as it's the only gender parameter available globally.
-        tts_payload = {"text_to_speak": translated_text, "gender": 'female', "language": output_language}
-        tts_response = requests.post("http://127.0.0.1:5002/api/v1/tts/jobs", json=tts_payload)
-        tts_response.raise_for_status()
-        tts_job_id = tts_response.json()["jobId"]
-        tts_result = poll_for_result("TTS", tts_job_id, f"http://127.0.0.1:5002/api/v1/tts/jobs/{tts_job_id}")
-        audio_url = tts_result["audio_url"]
-        
-        jobs[job_id]["status"] = "completed"
-        jobs[job_id]["result"] = audio_url
+        def translate_and_speak(target: str) -> str:
+            # Step 2: Call MT to translate the extracted text
+            mt_result = run_stage("MT", {"text": extracted_text, "language1": input_language, "language2": target}, job_id)
+            translated_text = mt_result["translatedText"]
+
+            # Step 3: Call TTS to get audio output
+            # NOTE: We assume 'female' gender, as it's the only gender parameter available globally.
+            tts_result = run_stage("TTS", {"text_to_speak": translated_text, "gender": 'female', "language": target}, job_id)
+            return playback_url(tts_result)
+
+        complete_targets(job_id, output_language, translate_and_speak)
     except Exception as e:
-        jobs[job_id]["status"] = "failed"
-        jobs[job_id]["result"] = json.dumps({"error": str(e)}) 
+        fail_job(job_id, e)
     finally:
-        # CRITICAL: File cleanup
-        try:
-            if os.path.exists(file_path):
-                os.remove(file_path)
-                print(f"ORCHESTRATOR (I2A-PIPE): Cleaned up file: {file_path}")
-        except Exception as cleanup_err:
-            print(f"ORCHESTRATOR (I2A-PIPE): Warning: Failed to delete {file_path}: {cleanup_err}")
+        remove_upload(job_id, file_path)
 
 
 # --- API Endpoints ---
 
 # Endpoints for Framework 1 (No changes)
-@app.post("/api/v2/document-translation", response_model=Job, status_code=202, tags=["Framework 1: Document Translation"])
-async def start_doc_trans_job(request: DocumentTranslationRequest, background_tasks: BackgroundTasks):
+@app.post("/api/v2/document-translation", response_model=Job, status_code=202, dependencies=[Depends(admit(STANDARD, "OCR", "MT"))], tags=["Framework 1: Document Translation"])
+async def start_doc_trans_job(request: DocumentTranslationRequest):
     job_id = str(uuid.uuid4())
-    jobs[job_id] = {"status": "processing", "result": None}
-    background_tasks.add_task(run_document_translation_pipeline, job_id, request.image_file_path, request.input_language.upper(), request.output_language.upper())
+    targets = normalize_targets(request.output_language)
+    jobs[job_id] = new_job_state(request.deadline_seconds)
+    enqueue(job_id, "document-translation", STANDARD, request.image_file_path, request.input_language.upper(), targets)
     return {"jobId": job_id, "status": "processing"}
 
 @app.get("/api/v2/document-translation/jobs/{job_id}", response_model=Job, tags=["Framework 1: Document Translation"])
@@ -317,11 +474,12 @@ async def get_doc_trans_status(job_id: str):
     return {"jobId": job_id, **job}
 
 # Endpoints for Framework 2 (No changes)
-@app.post("/api/v2/speech-translation", response_model=Job, status_code=202, tags=["Framework 2: Speech Translation"])
-async def start_speech_trans_job(request: SpeechTranslationRequest, background_tasks: BackgroundTasks):
+@app.post("/api/v2/speech-translation", response_model=Job, status_code=202, dependencies=[Depends(admit(STANDARD, "ASR", "MT"))], tags=["Framework 2: Speech Translation"])
+async def start_speech_trans_job(request: SpeechTranslationRequest):
     job_id = str(uuid.uuid4())
-    jobs[job_id] = {"status": "processing", "result": None}
-    background_tasks.add_task(run_speech_translation_pipeline, job_id, request.audio_file_path, request.input_language.upper(), request.output_language.upper())
+    targets = normalize_targets(request.output_language)
+    jobs[job_id] = new_job_state(request.deadline_seconds)
+    enqueue(job_id, "speech-translation", STANDARD, request.audio_file_path, request.input_language.upper(), targets)
     return {"jobId": job_id, "status": "processing"}
 
 @app.get("/api/v2/speech-translation/jobs/{job_id}", response_model=Job, tags=["Framework 2: Speech Translation"])
@@ -330,11 +488,12 @@ async def get_speech_trans_status(job_id: str):
     return {"jobId": job_id, **job}
 
 # Endpoints for Framework 3 (No changes)
-@app.post("/api/v2/text-to-speech", response_model=Job, status_code=202, tags=["Framework 3: Text to Speech"])
-async def start_tts_synth_job(request: TextToSpeechRequest, background_tasks: BackgroundTasks):
+@app.post("/api/v2/text-to-speech", response_model=Job, status_code=202, dependencies=[Depends(admit(STANDARD, "MT", "TTS"))], tags=["Framework 3: Text to Speech"])
+async def start_tts_synth_job(request: TextToSpeechRequest):
     job_id = str(uuid.uuid4())
-    jobs[job_id] = {"status": "processing", "result": None}
-    background_tasks.add_task(run_text_to_speech_pipeline, job_id, request.text, request.gender, request.input_language.upper(), request.output_language.upper())
+    targets = normalize_targets(request.output_language)
+    jobs[job_id] = new_job_state(request.deadline_seconds)
+    enqueue(job_id, "text-to-speech", STANDARD, request.text, request.gender, request.input_language.upper(), targets)
     return {"jobId": job_id, "status": "processing"}
 
 @app.get("/api/v2/text-to-speech/jobs/{job_id}", response_model=Job, tags=["Framework 3: Text to Speech"])
@@ -343,11 +502,12 @@ async def get_tts_synth_status(job_id: str):
     return {"jobId": job_id, **job}
 
 # NEW: Endpoints for Framework 4
-@app.post("/api/v2/speech-to-speech", response_model=Job, status_code=202, tags=["Framework 4: Speech-to-Speech Translation"])
-async def start_s2s_trans_job(request: SpeechToSpeechRequest, background_tasks: BackgroundTasks):
+@app.post("/api/v2/speech-to-speech", response_model=Job, status_code=202, dependencies=[Depends(admit(STANDARD, "ASR", "MT", "TTS"))], tags=["Framework 4: Speech-to-Speech Translation"])
+async def start_s2s_trans_job(request: SpeechToSpeechRequest):
     job_id = str(uuid.uuid4())
-    jobs[job_id] = {"status": "processing", "result": None}
-    background_tasks.add_task(run_speech_to_speech_pipeline, job_id, request.audio_file_path, request.gender, request.input_language.upper(), request.output_language.upper())
+    targets = normalize_targets(request.output_language)
+    jobs[job_id] = new_job_state(request.deadline_seconds)
+    enqueue(job_id, "speech-to-speech", STANDARD, request.audio_file_path, request.gender, request.input_language.upper(), targets)
     return {"jobId": job_id, "status": "processing"}
 
 @app.get("/api/v2/speech-to-speech/jobs/{job_id}", response_model=Job, tags=["Framework 4: Speech-to-Speech Translation"])
@@ -358,13 +518,14 @@ async def get_s2s_trans_status(job_id: str):
 
 #frame 5
 # Endpoints for Framework 3 (No changes)
-@app.post("/api/v2/text-to-text", response_model=Job, status_code=202, tags=["Framework 5: Text to Text"])
-async def start_t2t_job(request: TextToTextRequest, background_tasks: BackgroundTasks):
+@app.post("/api/v2/text-to-text", response_model=Job, status_code=202, dependencies=[Depends(admit(STANDARD, "MT"))], tags=["Framework 5: Text to Text"])
+async def start_t2t_job(request: TextToTextRequest):
     job_id = str(uuid.uuid4())
-    jobs[job_id] = {"status": "processing", "result": None}
+    targets = normalize_targets(request.output_language)
+    jobs[job_id] = new_job_state(request.deadline_seconds)
     
     # Calls the new, simpler T2T pipeline
-    background_tasks.add_task(run_text_to_text_pipeline, job_id, request.text, request.input_language.upper(), request.output_language.upper())
+    enqueue(job_id, "text-to-text", STANDARD, request.text, request.input_language.upper(), targets)
     return {"jobId": job_id, "status": "processing"}
 
 @app.get("/api/v2/text-to-text/jobs/{job_id}", response_model=Job, tags=["Framework 5: Text to Text"])
@@ -376,11 +537,12 @@ async def get_t2t_status(job_id: str):
 # In backend/v2_services/main.py
 
 # --- NEW: Endpoints for Framework 6 (Image-to-Audio) ---
-@app.post("/api/v2/image-to-audio", response_model=Job, status_code=202, tags=["Framework 6: Image to Audio"])
-async def start_i2a_job(request: DocumentTranslationRequest, background_tasks: BackgroundTasks):
+@app.post("/api/v2/image-to-audio", response_model=Job, status_code=202, dependencies=[Depends(admit(STANDARD, "OCR", "MT", "TTS"))], tags=["Framework 6: Image to Audio"])
+async def start_i2a_job(request: DocumentTranslationRequest):
     job_id = str(uuid.uuid4())
-    jobs[job_id] = {"status": "processing", "result": None}
-    background_tasks.add_task(run_image_to_audio_pipeline, job_id, request.image_file_path, request.input_language.upper(), request.output_language.upper())
+    targets = normalize_targets(request.output_language)
+    jobs[job_id] = new_job_state(request.deadline_seconds)
+    enqueue(job_id, "image-to-audio", STANDARD, request.image_file_path, request.input_language.upper(), targets)
     return {"jobId": job_id, "status": "processing"}
 
 @app.get("/api/v2/image-to-audio/jobs/{job_id}", response_model=Job, tags=["Framework 6: Image to Audio"])
@@ -429,7 +591,7 @@ async def get_i2a_status(job_id: str):
 # ---------------------
 # FILE UPLOAD ENDPOINTS (REPLACES OLD /api/v2/upload-image)
 # ---------------------
-from fastapi import UploadFile, File, Form, BackgroundTasks
+from fastapi import UploadFile, File, Form
 import shutil
 import os
 import uuid
@@ -471,6 +633,47 @@ async def upload_image_file(file: UploadFile = File(...)):
         raise HTTPException(status_code=500, detail=f"Image upload failed: {e}")
 
 
+# ---------------------
+# JOB CONTROL
+# ---------------------
+
+@app.post("/api/v2/jobs/{job_id}/cancel", response_model=Job, tags=["Utility"])
+async def cancel_job(job_id: str):
+    """
+    Cancels any v2 job. A queued job never starts; a running one stops at its
+    next stage boundary (before the next v1 call, or at the next poll).
+    """
+    if not (job := jobs.get(job_id)):
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["status"] == "processing":
+        job["status"] = "cancelled"
+        cancel_queued(job_id)
+    return {"jobId": job_id, "status": job["status"]}
+
+
+@app.get("/api/v2/scheduler/stats", tags=["Utility"])
+async def get_scheduler_stats():
+    if QUEUE_MODE == "durable":
+        return {"mode": QUEUE_MODE, "queue": queue_stats(), "interactive": scheduler.stats()["interactive"], "admission": admission_stats()}
+    return {"mode": QUEUE_MODE, **scheduler.stats(), "admission": admission_stats()}
+
+
+# ---------------------
+# LOCAL TTS AUDIO (served from the shared audio store, with Range support)
+# ---------------------
+
+
+@app.api_route("/api/v2/audio/{audio_id}", methods=["GET", "HEAD"], tags=["Utility"])
+async def get_stored_audio(audio_id: str, request: Request):
+    store = get_audio_store()
+    if store is None or not (path := store.path_for(audio_id)):
+        raise HTTPException(status_code=404, detail="Audio not found")
+    return audio_file_response(request, path, audio_id)
+
+
 from . import conversation_service
 app.include_router(conversation_service.router)
 
+from . import batch_service
+app.include_router(batch_service.router)
+
@@ -0,0 +1,125 @@
+# backend/v2_services/planner.py
+#
+# Stage planner for the v2 pipelines.
+#
+# Before each v1 call, a pipeline asks plan_stage() whether the call is needed
+# at all. A stage is elided when its outcome is already known:
+#
+#   same_language  MT from a language to itself returns the input text
+#   empty_input    MT or TTS of empty/whitespace text (e.g. a blank page or a
+#                  silent recording) has nothing to translate or speak; TTS
+#                  then reports {"audio_url": None, "no_audio": "empty_text"}
+#   cached         the same stage ran on the same input recently (same text and
+#                  languages, or for OCR/ASR the same file content and language)
+#
+# Every v1 call costs an upstream request plus at least one poll round trip, so
+# an elided stage saves seconds and API quota. The cache is per process, LRU,
+# and bounded by V2_STAGE_CACHE_SIZE entries and V2_STAGE_CACHE_TTL_SECONDS.
+
+from collections import OrderedDict
+import hashlib
+import json
+import os
+import threading
+import time
+
+from common.audio_store import get_audio_store
+
+STAGE_CACHE_SIZE = int(os.getenv("V2_STAGE_CACHE_SIZE", "1024"))
+# TTS results point at stored/remote audio that eventually expires, so entries do too.
+STAGE_CACHE_TTL_SECONDS = float(os.getenv("V2_STAGE_CACHE_TTL_SECONDS", "3600"))
+
+FILE_FIELDS = {"OCR": "image_file_path", "ASR": "audio_file_path"}
+TEXT_FIELDS = {"MT": "text", "TTS": "text_to_speak"}
+NO_AUDIO_EMPTY_TEXT = "empty_text"
+
+
+class StageCache:
+    def __init__(self, max_entries: int = STAGE_CACHE_SIZE, ttl: float = STAGE_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, result = entry
+            if time.time() - stored_at > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return result
+
+    def discard(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def put(self, key: str, result: dict):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.time(), result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+cache = StageCache()
+
+
+def _file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def stage_key(service: str, payload: dict) -> str | None:
+    """Cache key for a v1 call, from its inputs only (not deadline/trace fields)."""
+    inputs = {k: v for k, v in payload.items() if k not in ("deadline", "trace_id")}
+    if service in FILE_FIELDS:
+        path = inputs.pop(FILE_FIELDS[service])
+        try:
+            inputs["file_sha256"] = _file_digest(path)
+        except OSError:
+            return None
+    return f"{service}:" + json.dumps(inputs, sort_keys=True, ensure_ascii=False)
+
+
+def plan_stage(service: str, payload: dict) -> tuple[str | None, dict | None, str | None]:
+    """
+    Decides whether a v1 stage has to run. Returns (skip_reason, result, key):
+    skip_reason and result are set when the stage can be elided, and key is the
+    cache key to store the result under once the stage did run.
+    """
+    if service == "MT" and payload["language1"].upper() == payload["language2"].upper():
+        return "same_language", {"translatedText": payload["text"]}, None
+
+    if service in TEXT_FIELDS and not payload[TEXT_FIELDS[service]].strip():
+        if service == "MT":
+            return "empty_input", {"translatedText": payload["text"]}, None
+        return "empty_input", {"audio_url": None, "no_audio": NO_AUDIO_EMPTY_TEXT}, None
+
+    key = stage_key(service, payload)
+    if key is not None and (cached := cache.get(key)) is not None:
+        if _audio_available(cached):
+            return "cached", cached, key
+        cache.discard(key)
+    return None, None, key
+
+
+def _audio_available(result: dict) -> bool:
+    """A cached TTS result that points into the audio store is only reusable while the store still has the file."""
+    if not result.get("audio_id"):
+        return True
+    store = get_audio_store()
+    return store is not None and store.path_for(result["audio_id"]) is not None
+
+
+def remember(key: str | None, result: dict):
+    if key is not None:
+        cache.put(key, result)
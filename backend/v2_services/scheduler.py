@@ -0,0 +1,77 @@
+# backend/v2_services/scheduler.py
+#
+# Priority scheduling for orchestration work.
+#
+# Before this, live turns, batch conversations and single pipelines all ran in
+# the same FastAPI threadpool, so one big conversation could starve the live
+# interpreter. Each priority class now gets its own worker pool, sized by its
+# concurrency share:
+#
+#   interactive  live-turn requests a user is actively waiting on
+#   standard     single v2 pipeline jobs (document, speech, text, ...)
+#   bulk         batch work (conversations), allowed to take longer
+#
+# Because the pools are separate, a backlog in one class never delays another:
+# interactive latency stays bounded by its own share, and bulk work always keeps
+# at least its own workers busy, so it still makes progress under load.
+
+from concurrent.futures import Future, ThreadPoolExecutor
+import asyncio
+import os
+import threading
+
+INTERACTIVE = "interactive"
+STANDARD = "standard"
+BULK = "bulk"
+
+DEFAULT_SHARES = {
+    INTERACTIVE: int(os.getenv("SCHEDULER_INTERACTIVE_WORKERS", "8")),
+    STANDARD: int(os.getenv("SCHEDULER_STANDARD_WORKERS", "6")),
+    BULK: int(os.getenv("SCHEDULER_BULK_WORKERS", "2")),
+}
+
+
+class PriorityScheduler:
+    def __init__(self, shares: dict[str, int]):
+        self.shares = shares
+        self._pools = {
+            name: ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"sched-{name}")
+            for name, workers in shares.items()
+        }
+        self._lock = threading.Lock()
+        self._queued = {name: 0 for name in shares}
+        self._running = {name: 0 for name in shares}
+
+    def submit(self, priority: str, fn, *args, **kwargs) -> Future:
+        """Queues `fn(*args, **kwargs)` on the pool of the given priority class."""
+        if priority not in self._pools:
+            raise ValueError(f"Unknown priority class: {priority}")
+
+        with self._lock:
+            self._queued[priority] += 1
+
+        def run():
+            with self._lock:
+                self._queued[priority] -= 1
+                self._running[priority] += 1
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self._running[priority] -= 1
+
+        return self._pools[priority].submit(run)
+
+    async def run(self, priority: str, fn, *args, **kwargs):
+        """Runs `fn` on the given priority class and awaits its result without blocking the event loop."""
+        return await asyncio.wrap_future(self.submit(priority, fn, *args, **kwargs))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                name: {"workers": self.shares[name], "queued": self._queued[name], "running": self._running[name]}
+                for name in self.shares
+            }
+
+
+scheduler = PriorityScheduler(DEFAULT_SHARES)
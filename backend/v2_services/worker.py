@@ -0,0 +1,142 @@
+# backend/v2_services/worker.py
+#
+# Worker pool for the durable v2 job queue (V2_JOB_QUEUE=durable).
+#
+#   cd backend/
+#   V2_JOB_QUEUE=durable python -m v2_services.worker
+#
+# Starts one worker process per CPU core by default (V2_WORKER_PROCESSES
+# overrides it), independent of how many uvicorn workers serve HTTP. Each process
+# runs V2_WORKER_THREADS pipeline threads, because pipelines spend most of their
+# time waiting on the v1 services. The supervisor restarts any process that dies,
+# and jobs it was running are picked up again once their lease expires.
+
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+import time
+
+from common.event_log import EventLog
+
+log = EventLog("v2-worker")
+
+WORKER_PROCESSES = int(os.getenv("V2_WORKER_PROCESSES", "0")) or os.cpu_count() or 1
+WORKER_THREADS = int(os.getenv("V2_WORKER_THREADS", "8"))
+IDLE_POLL_SECONDS = float(os.getenv("V2_WORKER_IDLE_POLL_SECONDS", "0.5"))
+
+FINISHED_STATUSES = {"completed", "partially_completed", "failed", "cancelled"}
+
+
+def pool_class_limits(total_threads: int) -> dict[str, int]:
+    """
+    Concurrency per priority class over the whole pool: the scheduler shares of
+    the queued classes, scaled to the real number of pipeline threads. Each class
+    leaves at least one thread to every other class, so bulk work keeps making
+    progress however many standard jobs are waiting.
+    """
+    from .scheduler import DEFAULT_SHARES, INTERACTIVE
+
+    # Interactive work (live turns) runs in the web process, never on the queue
+    shares = {name: share for name, share in DEFAULT_SHARES.items() if name != INTERACTIVE}
+    total_share = sum(shares.values()) or 1
+    reserved = len(shares) - 1
+    return {
+        name: max(1, min(round(total_threads * share / total_share), total_threads - reserved))
+        for name, share in shares.items()
+    }
+
+
+def run_worker_process(index: int, processes: int):
+    # Importing the app registers every pipeline task with the queue.
+    from . import main
+    from . import job_queue
+
+    worker_name = f"{socket.gethostname()}:{os.getpid()}"
+    class_limits = pool_class_limits(WORKER_THREADS * processes)
+    running = set()
+    running_lock = threading.Lock()
+    stopping = threading.Event()
+
+    signal.signal(signal.SIGTERM, lambda *_: stopping.set())
+    signal.signal(signal.SIGINT, lambda *_: stopping.set())
+
+    def heartbeat():
+        while not stopping.wait(job_queue.LEASE_SECONDS / 3):
+            with running_lock:
+                job_ids = list(running)
+            job_queue.renew_leases(worker_name, job_ids)
+
+    def pipeline_thread():
+        while not stopping.is_set():
+            job = job_queue.claim(worker_name, class_limits)
+            if job is None:
+                time.sleep(IDLE_POLL_SECONDS)
+                continue
+
+            log.emit("worker.job_claimed", job["job_id"], worker=worker_name, task=job["task"], attempt=job["attempt"])
+            state = main.jobs.get(job["job_id"])
+            if state is not None and state["status"] in FINISHED_STATUSES:
+                # The previous worker finished (or the job was cancelled) but died before complete()
+                log.emit("worker.job_already_finished", job["job_id"], worker=worker_name, status=state["status"])
+                job_queue.complete(job["job_id"])
+                continue
+
+            with running_lock:
+                running.add(job["job_id"])
+            try:
+                job_queue.TASKS[job["task"]](job["job_id"], *job["args"])
+            except Exception as e:
+                log.error("worker.task_raised", job["job_id"], worker=worker_name, task=job["task"], error=str(e))
+            finally:
+                with running_lock:
+                    running.discard(job["job_id"])
+                job_queue.complete(job["job_id"])
+
+    threading.Thread(target=heartbeat, daemon=True).start()
+    threads = [threading.Thread(target=pipeline_thread, name=f"worker-{index}-{i}") for i in range(WORKER_THREADS)]
+    for t in threads:
+        t.start()
+    log.emit("worker.started", worker=worker_name, threads=WORKER_THREADS, class_limits=class_limits)
+    for t in threads:
+        t.join()
+
+
+def main():
+    ctx = multiprocessing.get_context("spawn")
+    processes = {}
+    stopping = False
+
+    def start(index: int):
+        p = ctx.Process(target=run_worker_process, args=(index, WORKER_PROCESSES), name=f"v2-worker-{index}")
+        p.start()
+        processes[index] = p
+
+    def stop(*_):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    log.emit("supervisor.started", processes=WORKER_PROCESSES)
+    for index in range(WORKER_PROCESSES):
+        start(index)
+
+    while not stopping:
+        time.sleep(1)
+        for index, p in list(processes.items()):
+            if not p.is_alive() and not stopping:
+                log.warning("supervisor.worker_restarted", worker=index, exitcode=p.exitcode)
+                start(index)
+
+    # Workers finish the jobs they are running; unfinished ones are resumed on next start.
+    for p in processes.values():
+        p.terminate()
+    for p in processes.values():
+        p.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -95,6 +95,15 @@ document.addEventListener('DOMContentLoaded', () => {
         return data.file_path;
     };
 
+    // --- JOB CANCELLATION (stops server-side work the user no longer waits for) ---
+    let activeJobId = null;
+    const cancelActiveJob = () => {
+        if (!activeJobId) return;
+        navigator.sendBeacon(`${BASE_URL}/api/v2/jobs/${activeJobId}/cancel`);
+        activeJobId = null;
+    };
+    window.addEventListener('pagehide', cancelActiveJob);
+
     // --- POLLING LOGIC (For asynchronous jobs F1, F2, F3, F4) ---
     const pollJobStatus = (jobUrl) => {
         return new Promise((resolve, reject) => {
@@ -236,6 +245,7 @@ document.addEventListener('DOMContentLoaded', () => {
         outputText.value = '';
         audioDownloadLink.classList.add('hidden');
         audioResultPlaceholder.classList.remove('hidden');
+        audioResultPlaceholder.querySelector('p').textContent = 'Audio output will be available here.';
 
         // 3. Determine API endpoint and prepare data
         let endpoint = '';
@@ -335,6 +345,11 @@ document.addEventListener('DOMContentLoaded', () => {
             const initialResponse = await fetch(BASE_URL + endpoint, postOptions);
             if (!initialResponse.ok) {
                 const errorBody = await initialResponse.json().catch(() => ({}));
+                // 429/503: the server is shedding load and says when to come back
+                const retryAfter = initialResponse.headers.get('Retry-After');
+                if (retryAfter) {
+                    throw new Error(`${errorBody.detail || 'Server busy'} (retry in ${retryAfter}s)`);
+                }
                 throw new Error(`Initial request failed: ${initialResponse.statusText} - ${JSON.stringify(errorBody.detail || errorBody)}`);
             }
             
@@ -347,9 +362,11 @@ document.addEventListener('DOMContentLoaded', () => {
                 // Asynchronous Job Polling for F1, F2, F3
                 const jobData = await initialResponse.json();
                 const { jobId } = jobData;
+                activeJobId = jobId;
                 processBtnText.textContent = 'Checking status...';
                 const jobUrl = BASE_URL + jobUrlBase + jobId;
                 result = await pollJobStatus(jobUrl);
+                activeJobId = null;
             }
 
             // 5. Display Result
@@ -357,14 +374,22 @@ document.addEventListener('DOMContentLoaded', () => {
                 const textResult = isLiveTurn ? result.translated_text : result; 
                 outputText.value = textResult; 
             } else if (outputType === 'Audio') {
-                const audioUrl = isLiveTurn ? result.output_audio_url : result;
-                
-                audioDownloadLink.href = audioUrl;
-                audioResultPlaceholder.classList.add('hidden');
-                audioDownloadLink.classList.remove('hidden');
+                let audioUrl = isLiveTurn ? result.output_audio_url : result;
+                if (!audioUrl) {
+                    // The job completed with no_audio: there was no text to speak (blank page, silent recording)
+                    audioResultPlaceholder.querySelector('p').textContent = 'No audio: there was no text to speak.';
+                } else {
+                    // Locally stored TTS audio comes back as a path on the v2 service
+                    if (audioUrl.startsWith('/')) audioUrl = BASE_URL + audioUrl;
+
+                    audioDownloadLink.href = audioUrl;
+                    audioResultPlaceholder.classList.add('hidden');
+                    audioDownloadLink.classList.remove('hidden');
+                }
             }
 
         } catch (error) {
+            activeJobId = null;
             console.error('API Error:', error);
             errorMessage.textContent = `An error occurred during processing: ${error.message}`;
         } finally {